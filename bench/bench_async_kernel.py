@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'host'))
+import hostenv
+
+hostenv.install()
+
+from beeos import AsyncOSKernel, AsyncProcess, Context, PinEvent, Process
+from machine import Pin
+
+RUN_MS = 2000
+
+
+class PeriodProcess(Process):
+    def __init__(self, period):
+        self.PERIOD = period
+        self.runs = []
+
+    def loop(self, ctx):
+        self.runs.append(time.ticks_ms())
+
+
+class PinWaitProcess(AsyncProcess):
+    def __init__(self, pin):
+        self.event = PinEvent(pin)
+        self.latency = []
+        self.fired_at = 0
+
+    async def run(self, ctx):
+        while ctx.running:
+            await self.event.wait()
+            self.latency.append(time.ticks_ms() - self.fired_at)
+
+
+class PinDriver(AsyncProcess):
+    def __init__(self, pin, waiter):
+        self.pin = pin
+        self.waiter = waiter
+
+    async def run(self, ctx):
+        while ctx.running:
+            await ctx.sleep_ms(50)
+            self.waiter.fired_at = time.ticks_ms()
+            self.pin.drive(not self.pin.value())
+
+
+class Stopper(AsyncProcess):
+    async def run(self, ctx):
+        await ctx.sleep_ms(RUN_MS)
+        ctx.shutdown()
+
+
+def jitter(runs, period):
+    gaps = [runs[i + 1] - runs[i] - period for i in range(len(runs) - 1)]
+    if not gaps:
+        return 0, 0
+    return sum(gaps) / len(gaps), max(gaps)
+
+
+def main():
+    kernel = AsyncOSKernel(Context(), frq=100)
+    procs = [PeriodProcess(p) for p in (0, 100, 250, 500, 1000)]
+    for p in procs:
+        kernel.exec(p)
+    pin = Pin(14, Pin.IN)
+    waiter = PinWaitProcess(pin)
+    kernel.exec(waiter)
+    kernel.exec(PinDriver(pin, waiter))
+    kernel.exec(Stopper())
+    kernel.setup_os()
+    start = time.process_time()
+    kernel.run_forever()
+    cpu = (time.process_time() - start) * 1000
+    print('run %d ms, cpu %.1f ms, ticks %d' % (RUN_MS, cpu, kernel.ticks))
+    for p in procs:
+        avg, worst = jitter(p.runs, max(p.PERIOD, kernel.frq))
+        print('period %4d ms: %3d runs, jitter avg %.2f ms max %d ms' % (p.PERIOD, len(p.runs), avg, worst))
+    lat = waiter.latency
+    print('pin events: %d, latency avg %.2f ms max %d ms' % (len(lat), sum(lat) / max(len(lat), 1), max(lat or [0])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Compressed backgrounds: size and decode time of .bimg against the raw .data files.
+#   python bench/bench_bimg.py
+# RLE565 is built from the .data files and must decode byte-exact. The palette formats are
+# quantized from the source images (needs numpy and PIL, like image_tools.py) and must decode
+# to the palette colours of their indexes.
+import os
+import sys
+import tempfile
+
+import benchlib
+
+benchlib.setup_host()
+sys.path.insert(0, benchlib.ROOT)
+
+import numpy as np
+from PIL import Image
+
+import image_tools
+from tft import TFTBuf, TFTTask
+
+ASSETS = ((TFTTask.BC_CLOCK, 'bg_clock.jpeg'), (TFTTask.BC_TH, 'bg_th.jpg'))
+W = TFTBuf.W
+H = TFTBuf.H
+
+
+def expected(src, kind):
+    # What the decoder should produce, straight from numpy.
+    image = Image.open(os.path.join(benchlib.ROOT, src)).convert('RGB').resize((image_tools.W, image_tools.H))
+    q = image.quantize(colors=16 if kind == image_tools.PAL4 else 256, dither=Image.Dither.NONE)
+    idx = image_tools.scan(np.asarray(q))
+    pal = np.array(q.getpalette(), dtype=np.uint16).reshape(-1, 3)
+    return image_tools.rgb565(pal[idx]).astype('>u2').tobytes()
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    buf = TFTBuf(None)
+    failed = False
+    print('%-14s %-7s %8s %7s %10s %10s %10s' % ('asset', 'format', 'bytes', 'ratio', 'full ms', 'rect ms', 'raw ms'))
+    for data_file, src in ASSETS:
+        with open(data_file, 'rb') as f:
+            raw = f.read()
+        raw_ms = 1000 / benchlib.ops_per_sec(lambda: buf.fill_img(data_file, W))
+        for name, kind in (('rle', image_tools.RLE565), ('pal8', image_tools.PAL8), ('pal4', image_tools.PAL4)):
+            if kind == image_tools.RLE565:
+                out = image_tools.encode_raw(raw, W)
+                ref = raw
+            else:
+                with Image.open(os.path.join(benchlib.ROOT, src)) as image:
+                    out = image_tools.to_bimg(image, image_tools.W, image_tools.H, kind)
+                ref = expected(src, kind)
+            path = os.path.join(tmp, '%s.%s.bimg' % (data_file, name))
+            with open(path, 'wb') as f:
+                f.write(out)
+            buf.images = {}
+            buf.buf[:] = b'\xA5' * len(buf.buf)
+            buf.fill_img(path, W)
+            if buf.buf != ref:
+                print('MISMATCH %s %s' % (data_file, name))
+                failed = True
+                continue
+            # Sub-rect: the restore behind one vertical text line.
+            buf.fill_img_rect(path, W, 40, 6, 16, 80)
+            full_ms = 1000 / benchlib.ops_per_sec(lambda: buf.fill_img(path, W))
+            rect_ms = 1000 / benchlib.ops_per_sec(lambda: buf.fill_img_rect(path, W, 40, 6, 16, 80))
+            print('%-14s %-7s %8d %6.1fx %10.2f %10.2f %10.2f' % (
+                data_file, name, len(out), len(raw) / len(out), full_ms, rect_ms, raw_ms))
+        img = buf.rle(path)
+        print('%-14s scratch %d B (row in + row out + row table)' % (
+            '', len(img.src) + len(img.line) + len(img.table)))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'host'))
+import hostenv
+
+hostenv.install()
+
+
+class FakeClock:
+    # Deterministic stand-in for the MicroPython ticks clock, one tick per call.
+    def __init__(self):
+        self.now = 0
+
+    def ticks_ms(self):
+        self.now += 100
+        return self.now
+
+
+_clock = FakeClock()
+time.ticks_ms = _clock.ticks_ms
+
+from beeos import Context, OSKernel, Process, SlotContext, TimerOSKernel
+
+TICKS = 20000
+KEYS = ('mode', 'display_str_1', 'display_str_2', 'display_seg_visible', 'tft_text1', 'tft_text2')
+
+
+class NameTask(Process):
+    def loop(self, ctx):
+        ctx.get_var(OSKernel.TICKS_MS, 0)
+        ctx.get_var(TimerOSKernel.TICKS, 0)
+        for k in KEYS:
+            ctx.get_var(k)
+        ctx.set_var('display_str_1', '12')
+
+
+class SlotTask(Process):
+    def __init__(self):
+        self.slots = None
+
+    def loop(self, ctx):
+        if self.slots is None:
+            self.slots = [ctx.slot(k) for k in (OSKernel.TICKS_MS, TimerOSKernel.TICKS) + KEYS]
+        for s in self.slots:
+            ctx.get(s)
+        ctx.put(self.slots[3], '12')
+
+
+def run_kernel(ctx, task_cls, tasks=5):
+    kernel = TimerOSKernel(ctx)
+    for k in KEYS:
+        ctx.set_var(k, 0)
+    for i in range(tasks):
+        kernel.exec(task_cls())
+    start = time.perf_counter()
+    for i in range(TICKS):
+        kernel._loop()
+    return (time.perf_counter() - start) / TICKS * 1000000
+
+
+def run_raw(ctx, reads=100000):
+    ctx.set_var('mode', 1)
+    start = time.perf_counter()
+    for i in range(reads):
+        ctx.get_var('mode')
+        ctx.set_var('mode', i & 1)
+    name_us = (time.perf_counter() - start) / reads * 1000000
+    slot = ctx.slot('mode')
+    start = time.perf_counter()
+    for i in range(reads):
+        ctx.get(slot)
+        ctx.put(slot, i & 1)
+    slot_us = (time.perf_counter() - start) / reads * 1000000
+    return name_us, slot_us
+
+
+def main():
+    print('%-28s %10s' % ('case', 'us/op'))
+    for label, ctx_cls in (('Context', Context), ('SlotContext', lambda: SlotContext(KEYS))):
+        name_us, slot_us = run_raw(ctx_cls())
+        print('%-28s %10.3f' % (label + ' get/set_var', name_us))
+        print('%-28s %10.3f' % (label + ' get/put slot', slot_us))
+    print('%-28s %10s' % ('kernel tick (5 tasks)', 'us/tick'))
+    print('%-28s %10.3f' % ('Context + names', run_kernel(Context(), NameTask)))
+    print('%-28s %10.3f' % ('SlotContext + names', run_kernel(SlotContext(KEYS), NameTask)))
+    print('%-28s %10.3f' % ('SlotContext + slots', run_kernel(SlotContext(KEYS), SlotTask)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Background loading in TFTBuf, the old per byte row copy against readinto and BgCache:
+#   python bench/bench_fill_img.py
+import sys
+
+import benchlib
+
+benchlib.setup_host()
+
+from tft import BgCache, TFTBuf, TFTTask
+
+W = TFTBuf.W
+
+
+def legacy_fill_img(buf, file, w):
+    # fill_img as it was before readinto, kept as the reference.
+    with open(file, 'rb') as f:
+        y = 0
+        while True:
+            row = f.read(w * 2)
+            offset = y * w * 2
+            row_len = len(row)
+            for x in range(row_len):
+                buf.buf[offset + x] = row[x]
+            y += 1
+            if row_len < (w * 2):
+                break
+
+
+def legacy_fill_img_rect(buf, file, w, x, y, rw, rh):
+    with open(file, 'rb') as f:
+        for yy in range(y, y + rh):
+            f.seek((yy * w + x) * 2)
+            offset = (yy * W + x) * 2
+            row = f.read(rw * 2)
+            buf.buf[offset:offset + len(row)] = row
+
+
+def main():
+    bg = TFTTask.BC_CLOCK
+    new, old = TFTBuf(None), TFTBuf(None)
+    cache = BgCache()
+    hot = TFTBuf(None, cache)
+    cases = (
+        ('fill_img', lambda: legacy_fill_img(old, bg, W), lambda: new.fill_img(bg, W)),
+        ('fill_img_rect full width', lambda: legacy_fill_img_rect(old, bg, W, 0, 40, W, 60),
+         lambda: new.fill_img_rect(bg, W, 0, 40, W, 60)),
+        ('fill_img_rect text line', lambda: legacy_fill_img_rect(old, bg, W, 60, 6, 16, 80),
+         lambda: new.fill_img_rect(bg, W, 60, 6, 16, 80)),
+        ('fill_img cached', lambda: legacy_fill_img(old, bg, W), lambda: hot.fill_img(bg, W)),
+        ('fill_img_rect text cached', lambda: legacy_fill_img_rect(old, bg, W, 60, 6, 16, 80),
+         lambda: hot.fill_img_rect(bg, W, 60, 6, 16, 80)),
+    )
+    failed = False
+    print('%-28s %12s %12s %8s %10s %10s' % ('case', 'old ops/s', 'new ops/s', 'speedup', 'old alloc', 'new alloc'))
+    for name, old_fn, new_fn in cases:
+        old.buf[:] = new.buf[:] = hot.buf[:] = b'\xA5' * len(old.buf)
+        old_fn()
+        new_fn()
+        got = hot if name.endswith('cached') else new
+        if got.buf != old.buf:
+            print('MISMATCH %s' % name)
+            failed = True
+            continue
+        old_ops = benchlib.ops_per_sec(old_fn)
+        new_ops = benchlib.ops_per_sec(new_fn)
+        print('%-28s %12.1f %12.1f %7.1fx %10d %10d' % (
+            name, old_ops, new_ops, new_ops / old_ops,
+            benchlib.peak_alloc(old_fn), benchlib.peak_alloc(new_fn)))
+    print('cache %s' % cache.stats())
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
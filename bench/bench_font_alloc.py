@@ -0,0 +1,59 @@
+# Heap use of ASCIIFont glyph rendering, str_img against str_into a preallocated buffer:
+#   python bench/bench_font_alloc.py
+# Figures are net of an empty call. What str_into still shows is CPython boxing offsets above
+# 256 and making iterators, a few transient objects that do not grow with the text (small ints
+# are not heap objects on MicroPython). Fails if the peak grows with the text or passes MAX_ALLOC,
+# a glyph image alone is CHAR_BYTES.
+import sys
+
+import benchlib
+
+benchlib.setup_host()
+
+from font import ASCIIFont
+
+MAX_ALLOC = 512
+COLORS = ((0, 0), (0xF8, 0))
+
+
+def main():
+    font = ASCIIFont('ascii.font')
+    lazy = ASCIIFont('ascii.font', lazy=True)
+    texts = ('A', '12:34', '2026-10-17 12:34:56 ')
+    buf = bytearray(len(texts[-1]) * ASCIIFont.CHAR_BYTES)
+    mv = memoryview(buf)
+
+    def empty():
+        pass
+
+    base_peak = benchlib.peak_alloc(empty)
+    base_blk = benchlib.alloc_count(empty)
+    print('%-6s %-22s %10s %8s %10s %8s %12s' % (
+        'font', 'text', 'img peak', 'img blk', 'into peak', 'into blk', 'into chars/s'))
+    failed = False
+    for name, f in (('ram', font), ('lazy', lazy)):
+        peaks = []
+        for text in texts:
+            bc, fc = COLORS
+
+            def old():
+                f.str_img(text, bc, fc)
+
+            def new():
+                f.str_into(text, mv, 0, bc, fc)
+
+            new()
+            peak = benchlib.peak_alloc(new) - base_peak
+            peaks.append(peak)
+            print('%-6s %-22r %10d %8d %10d %8d %12.1f' % (
+                name, text, benchlib.peak_alloc(old) - base_peak, benchlib.alloc_count(old) - base_blk,
+                peak, benchlib.alloc_count(new) - base_blk, benchlib.ops_per_sec(new) * len(text)))
+        if peaks[-1] > peaks[1] or max(peaks) > MAX_ALLOC:
+            print('FAIL %s: str_into allocated %s bytes' % (name, peaks))
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# ST7735 fill, scroll and partial mode against the frame buffer push that gives the same picture:
+#   python bench/bench_hw.py
+# Both sides drive a PanelSim, which keeps the panel frame memory. After every step the
+# visible 80x160 area must be identical, SPI bytes and writes are counted per step.
+import sys
+
+import benchlib
+
+benchlib.setup_host()
+
+from ST7735 import TFT, TFTColor
+from tft import TFTBuf
+
+X0 = TFTBuf.X0
+Y0 = TFTBuf.Y0
+W = TFTBuf.W
+H = TFTBuf.H
+PAGE = W * H * 2
+# Rows a ticker step moves, divides H so the scroll area wraps back to the start.
+STEP = 8
+PANEL = TFTColor(0x20, 0x60, 0xC0)
+BLACK = TFTColor(0, 0, 0)
+PARTIAL = (40, 119)
+
+
+def fb_color(c):
+    # framebuf keeps RGB565 in the byte order it goes out in.
+    return ((c & 0xFF) << 8) | (c >> 8)
+
+
+class Side:
+    def __init__(self, tape):
+        self.sim = benchlib.PanelSim()
+        self.tft = TFT(self.sim, 0, 1, 2, size=(106, 160))
+        self.tft.dc = self.sim.dc
+        self.tft.cs = self.sim.cs
+        self.tft.reset = benchlib.PanelSim.Pin()
+        self.tft.initr()
+        self.buf = TFTBuf(self.tft)
+        self.tape = tape
+        self.page(0)
+
+    def page(self, row):
+        self.buf.mv[:] = self.tape[row * W * 2:row * W * 2 + PAGE]
+        self.buf.mark_all()
+        self.buf.show()
+
+    def visible(self):
+        return self.sim.visible(X0, Y0, W, H)
+
+
+def ticker_fb(side, i):
+    side.page((i + 1) * STEP)
+
+
+def ticker_hw(side, i):
+    # The rows scrolled out at the top come back at the bottom, rewrite them with the new ones.
+    tft = side.tft
+    tft.scroll_to((i + 1) * STEP)
+    new = side.tape[(i * STEP + H) * W * 2:((i + 1) * STEP + H) * W * 2]
+    y = Y0 + (i * STEP) % H
+    tft.image(X0, y, X0 + W - 1, y + STEP - 1, new)
+
+
+def fill_fb(side, x, y, w, h, c):
+    side.buf.fbuf.fill_rect(x, y, w, h, fb_color(c))
+    side.buf.mark(x, y, w, h)
+    side.buf.show()
+
+
+def partial_fb(side):
+    fill_fb(side, 0, 0, W, PARTIAL[0], BLACK)
+    fill_fb(side, 0, PARTIAL[1] + 1, W, H - PARTIAL[1] - 1, BLACK)
+
+
+def normal_fb(side):
+    side.buf.mv[:] = side.saved
+    side.buf.mark_all()
+    side.buf.show()
+
+
+STEPS = (
+    ('scroll_area', lambda s: None, lambda s: s.tft.scroll_area(Y0, TFT.SCROLL_ROWS - Y0 - H)),
+) + tuple(
+    ('ticker %d rows' % STEP, lambda s, i=i: ticker_fb(s, i), lambda s, i=i: ticker_hw(s, i)) for i in range(H // STEP)
+) + (
+    ('fill 80x40', lambda s: fill_fb(s, 0, 40, W, 40, PANEL), lambda s: s.tft.fill_rect(X0, Y0 + 40, X0 + W - 1, Y0 + 79, PANEL)),
+    ('fill screen', lambda s: fill_fb(s, 0, 0, W, H, BLACK), lambda s: s.tft.fill_rect(X0, Y0, X0 + W - 1, Y0 + H - 1, BLACK)),
+    ('fill 80x40', lambda s: fill_fb(s, 0, 60, W, 40, PANEL), lambda s: s.tft.fill_rect(X0, Y0 + 60, X0 + W - 1, Y0 + 99, PANEL)),
+    ('partial_mode', partial_fb, lambda s: s.tft.partial_mode(Y0 + PARTIAL[0], Y0 + PARTIAL[1])),
+    ('normal_mode', normal_fb, lambda s: s.tft.normal_mode()),
+)
+
+
+def main():
+    with open('bg_clock.data', 'rb') as f:
+        tape = f.read()
+    with open('bg_th.data', 'rb') as f:
+        tape += f.read()
+    fb = Side(tape)
+    hw = Side(tape)
+    failed = False
+    totals = {}
+    for i, (name, fb_op, hw_op) in enumerate(STEPS):
+        if name == 'partial_mode':
+            fb.saved = bytes(fb.buf.buf)
+        counts = []
+        for side, op in ((fb, fb_op), (hw, hw_op)):
+            b, w = side.sim.bytes, side.sim.writes
+            op(side)
+            counts.append((side.sim.bytes - b, side.sim.writes - w))
+        if fb.visible() != hw.visible():
+            print('MISMATCH step %d %s' % (i, name))
+            failed = True
+        t = totals.setdefault(name, [0, 0, 0, 0, 0])
+        t[0] += 1
+        t[1] += counts[0][0]
+        t[2] += counts[0][1]
+        t[3] += counts[1][0]
+        t[4] += counts[1][1]
+    print('%-16s %5s %12s %10s %12s %10s' % ('step', 'runs', 'push B', 'push wr', 'hw B', 'hw wr'))
+    for name, (n, fb_b, fb_w, hw_b, hw_w) in totals.items():
+        print('%-16s %5d %12d %10d %12d %10d' % (name, n, fb_b // n, fb_w // n, hw_b // n, hw_w // n))
+    print('RAM: frame buffer %d B, fill pattern %d B' % (len(fb.buf.buf), len(hw.tft._pattern)))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Indexed TFTBuf formats against RGB565: resident memory, flush cost, and the panel they produce.
+#   python bench/bench_indexed.py
+# Backgrounds are quantized with spare palette slots so the text colours stay exact, every
+# format must then put the same pixels on the panel.
+import os
+import sys
+import tempfile
+
+import benchlib
+
+benchlib.setup_host()
+sys.path.insert(0, benchlib.ROOT)
+
+import framebuf
+from PIL import Image
+
+import image_tools
+from tft import TFTBuf
+
+FORMATS = (('RGB565', framebuf.RGB565), ('GS8', framebuf.GS8), ('GS4', framebuf.GS4_HMSB))
+TEXTS = ((60, 6, '2026-10-17'), (40, 6, 'Clock'), (20, 6, 'MEM:42.0%'))
+
+
+class NullTFT(benchlib.PanelRecorder):
+    # Times show() itself, not the recorder.
+    def window_write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+
+
+def scene(buf, bg):
+    buf.fill_img(bg, TFTBuf.W)
+    buf.text8x8_h(0, 150, 'WIFI Ready', 0xFFFF)
+    for x, y, text in TEXTS:
+        buf.text8x16_v(x, y, text, 0xFF)
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    bgs = {}
+    with Image.open(os.path.join(benchlib.ROOT, 'bg_clock.jpeg')) as image:
+        for name, kind, colors in (('pal8', image_tools.PAL8, 250), ('pal4', image_tools.PAL4, 13)):
+            path = os.path.join(tmp, 'bg.%s.bimg' % name)
+            with open(path, 'wb') as f:
+                f.write(image_tools.to_bimg(image, image_tools.W, image_tools.H, kind, colors))
+            bgs[name] = path
+    failed = False
+    print('%-5s %-7s %9s %9s %11s %11s %9s' % ('bg', 'format', 'fb bytes', '+lut/line', 'full ms', 'line ms', 'spi wr'))
+    for bg_name, bg in sorted(bgs.items()):
+        ref = None
+        for name, fmt in FORMATS:
+            if bg_name == 'pal8' and fmt == framebuf.GS4_HMSB:
+                continue
+            tft = benchlib.PanelRecorder()
+            buf = TFTBuf(tft, fmt=fmt)
+            scene(buf, bg)
+            buf.show()
+            if ref is None:
+                ref = tft.panel
+            elif tft.panel != ref:
+                print('MISMATCH %s %s' % (bg_name, name))
+                failed = True
+            extra = 0 if buf.lut is None else len(buf.lut) + len(buf.line) + (len(buf.lut4) if buf.gs4 else 0)
+            writes = tft.writes
+            buf.tft = NullTFT()
+
+            def full():
+                buf.mark_all()
+                buf.show()
+
+            def line():
+                buf.mark(20, 6, 16, 72)
+                buf.show()
+
+            print('%-5s %-7s %9d %9d %11.2f %11.2f %9d' % (
+                bg_name, name, len(buf.buf), extra, 1000 / benchlib.ops_per_sec(full),
+                1000 / benchlib.ops_per_sec(line), writes))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
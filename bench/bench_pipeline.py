@@ -0,0 +1,86 @@
+# TFTTask with and without FramePipe on an SPI bus that takes real time per byte:
+#   python bench/bench_pipeline.py [baudrate]
+# blocked is how long loop() holds the caller per frame, latency the worst handoff to panel
+# time of the worker. The frames the pipe sends must leave the same picture as the direct path.
+import sys
+import time
+
+import benchlib
+
+benchlib.setup_host()
+
+from beeos import Context, OSKernel
+from tft import TFTTask
+
+BAUDRATE = 20000000
+FRAMES = 48
+# Pause between frames the producer asks for, ms. 0 outruns the bus on full frames.
+PERIODS = (0, 5, 20)
+
+
+def step(i):
+    # Text changes every frame, the background every fourth.
+    if i % 4 == 3:
+        return TFTTask.BC, TFTTask.BC_TH if i % 8 == 3 else TFTTask.BC_CLOCK
+    return (TFTTask.TEXT_1, TFTTask.TEXT_2, TFTTask.TEXT_3)[i % 3], '%02d:%02d' % (i // 60, i % 60)
+
+
+def task(pipeline, baudrate):
+    t = TFTTask(pipeline=pipeline)
+    t.tft.spi.timed = True
+    t.tft.spi.baudrate = baudrate
+    ctx = Context()
+    ctx.subscribe(t, t.SUBSCRIBE, lambda p: None)
+    ctx.set_var(OSKernel.TICKS_MS, t.last_act)
+    ctx.set_var(TFTTask.TEXT_1, 'Clock')
+    if t.pipe is not None:
+        t.pipe.start()
+    return t, ctx
+
+
+def run(pipeline, period, baudrate):
+    t, ctx = task(pipeline, baudrate)
+    t.loop(ctx)
+    blocked = []
+    for i in range(FRAMES):
+        name, value = step(i)
+        ctx.set_var(name, value)
+        start = time.perf_counter()
+        t.loop(ctx)
+        blocked.append(time.perf_counter() - start)
+        time.sleep(period / 1000)
+    # Frames dropped at the end still have to go out.
+    while t.dirty:
+        if t.pipe is not None:
+            t.pipe.wait()
+        t.loop(ctx)
+    if t.pipe is not None:
+        t.pipe.stop()
+    return t, blocked
+
+
+def main():
+    baudrate = int(sys.argv[1]) if len(sys.argv) > 1 else BAUDRATE
+    failed = False
+    print('bus %d Hz, %d frames' % (baudrate, FRAMES))
+    print('%-10s %6s %12s %12s %12s %7s %7s' % ('mode', 'period', 'blocked ms', 'max ms', 'latency max',
+                                                 'frames', 'drops'))
+    for period in PERIODS:
+        ref, blocked = run(False, period, baudrate)
+        print('%-10s %6d %12.2f %12.2f %12s %7d %7s' % ('direct', period, 1000 * sum(blocked) / len(blocked),
+                                                         1000 * max(blocked), '-', len(blocked), '-'))
+        t, blocked = run(True, period, baudrate)
+        pipe = t.pipe
+        print('%-10s %6d %12.2f %12.2f %12.2f %7d %7d' % ('pipelined', period, 1000 * sum(blocked) / len(blocked),
+                                                           1000 * max(blocked), pipe.latency_max / 1000,
+                                                           pipe.frames, pipe.drops))
+        for buf in pipe.bufs:
+            if buf.buf != ref.buf.buf:
+                print('MISMATCH period %d' % period)
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
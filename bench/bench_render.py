@@ -0,0 +1,103 @@
+# Render and display hot paths on the host stand-ins:
+#   python bench/bench_render.py          compare against bench/render_baseline.json
+#   python bench/bench_render.py --save   record new cases and cases whose counters moved
+#   python bench/bench_render.py --save --only NAME   re-record the matching cases
+# SPI bytes, pixel writes and allocations are gated, timings only reported. Only save when a
+# change deliberately moves a measured case, and say which in the commit message.
+import os
+import sys
+
+import benchlib
+
+benchlib.setup_host()
+
+import framebuf
+import neopixel
+from beeos import Context, OSKernel
+from font import ASCIIFont
+from led_display import ScreenGroup, SegScreen
+from tft import TFTBuf, TFTTask
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render_baseline.json')
+
+
+def tft_task():
+    task = TFTTask()
+    task.setup()
+    ctx = Context()
+    ctx.subscribe(task, task.SUBSCRIBE, lambda p: None)
+    ctx.set_var(TFTTask.TITLE, 'WIFI Ready')
+    ctx.set_var(TFTTask.TEXT_1, 'Clock')
+    ctx.set_var(TFTTask.TEXT_2, 'MEM:42.0%')
+    ctx.set_var(TFTTask.TEXT_3, '2026-10-17')
+    return task, ctx
+
+
+def cases():
+    task, ctx = tft_task()
+    buf = task.buf
+    font = ASCIIFont('ascii.font')
+    lazy = ASCIIFont('ascii.font', lazy=True)
+    img = bytearray(5 * ASCIIFont.CHAR_BYTES)
+    np = neopixel.NeoPixel(None, 42)
+    seg = SegScreen(np, 0)
+    group = ScreenGroup(np, (SegScreen(np, 0), SegScreen(np, 21)))
+
+    ctx.set_var(OSKernel.TICKS_MS, task.last_act)
+    toggle = [0, 0]
+
+    def full_flush():
+        toggle[0] ^= 1
+        ctx.set_var(TFTTask.BC, (TFTTask.BC_CLOCK, TFTTask.BC_TH)[toggle[0]])
+        task.loop(ctx)
+
+    def line_flush():
+        toggle[1] ^= 1
+        ctx.set_var(TFTTask.TEXT_2, ('MEM:42.0%', 'MEM:42.1%')[toggle[1]])
+        task.loop(ctx)
+
+    return task.tft.spi, (
+        ('TFTBuf.fill_img', lambda: buf.fill_img(TFTTask.BC_CLOCK, 80)),
+        ('TFTBuf.text8x16_v', lambda: buf.text8x16_v(60, 6, '2026-10-17', 0xFF)),
+        ('TFTBuf.image', lambda: buf.image('icon_keqin.data', 0, 0, 80)),
+        ('TFTTask.loop', full_flush),
+        ('TFTTask.loop one line', line_flush),
+        ('ScreenGroup.show', lambda: group.show('42')),
+        ('SegScreen.show', lambda: seg.show('8')),
+        ('ASCIIFont.find_font', lambda: font.find_font('~')),
+        ('ASCIIFont.find_font lazy', lambda: lazy.find_font('~')),
+        ('ASCIIFont.str_img', lambda: font.str_img('12:34', (0, 0), (0xF8, 0))),
+        ('ASCIIFont.str_into', lambda: font.str_into('12:34', img, 0, (0, 0), (0xF8, 0))),
+    )
+
+
+def main():
+    args = benchlib.main_args()
+    spi, items = cases()
+    suite = benchlib.Suite('render', BASELINE)
+    for name, fn in items:
+        if args.only not in name:
+            continue
+        # Counters are taken from a warm call, caches filled by the first one.
+        fn()
+        bytes0 = spi.bytes
+        px0 = framebuf.FrameBuffer.pixel_writes + neopixel.NeoPixel.pixel_writes
+        fn()
+        spi_bytes = spi.bytes - bytes0
+        pixels = framebuf.FrameBuffer.pixel_writes + neopixel.NeoPixel.pixel_writes - px0
+        alloc = benchlib.peak_alloc(fn)
+        ops, rel = benchlib.relative_ops(fn)
+        suite.add(name, ops, spi=spi_bytes, alloc=alloc, pixels=pixels, rel=round(rel, 4))
+    failures = suite.compare()
+    if args.save:
+        saved = suite.save(list(suite.results) if args.only else None)
+        print('baseline %s: %s' % (BASELINE, ', '.join(saved) or 'unchanged'))
+        return
+    for f in failures:
+        print('REGRESSION %s' % f)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+# Command stream of the ST7735 driver against the one command per CS frame it replaced:
+#   python bench/bench_st7735.py
+# A fake SPI and pins record what reaches the panel. The bytes, their DC level and the delays
+# must be unchanged, CS frames, SPI writes and allocations are counted per operation.
+import sys
+import time
+
+import benchlib
+
+benchlib.setup_host()
+
+from ST7735 import TFT
+
+PIXELS = bytes(range(64))
+
+
+class RecPin:
+    def __init__(self, rec, name):
+        self.rec = rec
+        self.name = name
+        self.v = 1
+
+    def __call__(self, v=None):
+        if v is None:
+            return self.v
+        if self.name == 'cs' and self.v and not v:
+            self.rec.frames += 1
+        self.v = v
+
+
+class RecSPI:
+    # Keeps the stream as runs of (dc, bytes) and ('sleep', us), CS must be low for bytes.
+    # Turn off record to count allocations of the driver alone.
+    def __init__(self):
+        self.frames = 0
+        self.writes = 0
+        self.stream = []
+        self.record = True
+        self.dc = RecPin(self, 'dc')
+        self.cs = RecPin(self, 'cs')
+
+    def write(self, buf):
+        assert not self.cs.v, 'write with CS high'
+        self.writes += 1
+        if not self.record:
+            return
+        if self.stream and self.stream[-1][0] == self.dc.v:
+            self.stream[-1] = (self.dc.v, self.stream[-1][1] + bytes(buf))
+        else:
+            self.stream.append((self.dc.v, bytes(buf)))
+
+    def sleep_us(self, us):
+        if self.record:
+            self.stream.append(('sleep', us))
+
+
+class LegacyTFT(TFT):
+    # The driver before the command stream, one CS frame and a new buffer per command.
+    def _writecommand(self, aCommand):
+        self.dc(0)
+        self.cs(0)
+        self.spi.write(bytearray([aCommand]))
+        self.cs(1)
+
+    def _setwindowloc(self, aPos0, aPos1):
+        self._writecommand(TFT.CASET)
+        self.windowLocData[0] = self._offset[0]
+        self.windowLocData[1] = self._offset[0] + int(aPos0[0])
+        self.windowLocData[2] = self._offset[0]
+        self.windowLocData[3] = self._offset[0] + int(aPos1[0])
+        self._writedata(self.windowLocData)
+        self._writecommand(TFT.RASET)
+        self.windowLocData[0] = self._offset[1]
+        self.windowLocData[1] = self._offset[1] + int(aPos0[1])
+        self.windowLocData[2] = self._offset[1]
+        self.windowLocData[3] = self._offset[1] + int(aPos1[1])
+        self._writedata(self.windowLocData)
+        self._writecommand(TFT.RAMWR)
+
+    def image(self, x0, y0, x1, y1, data):
+        self._setwindowloc((x0, y0), (x1, y1))
+        self._writedata(data)
+
+    def window_begin(self, x0, y0, x1, y1):
+        self._setwindowloc((x0, y0), (x1, y1))
+        self.dc(1)
+        self.cs(0)
+
+    def window_end(self):
+        self.cs(1)
+
+    def initr(self):
+        self._reset()
+
+        self._writecommand(TFT.SWRESET)  # Software reset.
+        time.sleep_us(150)
+        self._writecommand(TFT.SLPOUT)  # out of sleep mode.
+        time.sleep_us(500)
+
+        data3 = bytearray([0x01, 0x2C, 0x2D])  # fastest refresh, 6 lines front, 3 lines back.
+        self._writecommand(TFT.FRMCTR1)  # Frame rate control.
+        self._writedata(data3)
+
+        self._writecommand(TFT.FRMCTR2)  # Frame rate control.
+        self._writedata(data3)
+
+        data6 = bytearray([0x01, 0x2c, 0x2d, 0x01, 0x2c, 0x2d])
+        self._writecommand(TFT.FRMCTR3)  # Frame rate control.
+        self._writedata(data6)
+        time.sleep_us(10)
+
+        data1 = bytearray(1)
+        self._writecommand(TFT.INVCTR)  # Display inversion control
+        data1[0] = 0x07  # Line inversion.
+        self._writedata(data1)
+
+        self._writecommand(TFT.PWCTR1)  # Power control
+        data3[0] = 0xA2
+        data3[1] = 0x02
+        data3[2] = 0x84
+        self._writedata(data3)
+
+        self._writecommand(TFT.PWCTR2)  # Power control
+        data1[0] = 0xC5  # VGH = 14.7V, VGL = -7.35V
+        self._writedata(data1)
+
+        data2 = bytearray(2)
+        self._writecommand(TFT.PWCTR3)  # Power control
+        data2[0] = 0x0A  # Opamp current small
+        data2[1] = 0x00  # Boost frequency
+        self._writedata(data2)
+
+        self._writecommand(TFT.PWCTR4)  # Power control
+        data2[0] = 0x8A  # Opamp current small
+        data2[1] = 0x2A  # Boost frequency
+        self._writedata(data2)
+
+        self._writecommand(TFT.PWCTR5)  # Power control
+        data2[0] = 0x8A  # Opamp current small
+        data2[1] = 0xEE  # Boost frequency
+        self._writedata(data2)
+
+        self._writecommand(TFT.VMCTR1)  # Power control
+        data1[0] = 0x0E
+        self._writedata(data1)
+
+        self._writecommand(TFT.INVOFF)
+
+        self._writecommand(TFT.MADCTL)  # Power control
+        data1[0] = 0xC8
+        self._writedata(data1)
+
+        self._writecommand(TFT.COLMOD)
+        data1[0] = 0x05
+        self._writedata(data1)
+
+        self._writecommand(TFT.CASET)  # Column address set.
+        self.windowLocData[0] = 0x00
+        self.windowLocData[1] = 0x00
+        self.windowLocData[2] = 0x00
+        self.windowLocData[3] = self._size[0] - 1
+        self._writedata(self.windowLocData)
+
+        self._writecommand(TFT.RASET)  # Row address set.
+        self.windowLocData[3] = self._size[1] - 1
+        self._writedata(self.windowLocData)
+
+        dataGMCTRP = bytearray([0x0f, 0x1a, 0x0f, 0x18, 0x2f, 0x28, 0x20, 0x22, 0x1f,
+                                0x1b, 0x23, 0x37, 0x00, 0x07, 0x02, 0x10])
+        self._writecommand(TFT.GMCTRP1)
+        self._writedata(dataGMCTRP)
+
+        dataGMCTRN = bytearray([0x0f, 0x1b, 0x0f, 0x17, 0x33, 0x2c, 0x29, 0x2e, 0x30,
+                                0x30, 0x39, 0x3f, 0x00, 0x07, 0x03, 0x10])
+        self._writecommand(TFT.GMCTRN1)
+        self._writedata(dataGMCTRN)
+        time.sleep_us(10)
+
+        self._writecommand(TFT.DISPON)
+        time.sleep_us(100)
+
+        self._writecommand(TFT.NORON)  # Normal display on.
+        time.sleep_us(10)
+
+        self.cs(1)
+
+
+def window(t):
+    t.window_begin(26, 1, 105, 160)
+    t.window_write(PIXELS)
+    t.window_end()
+
+
+OPS = (
+    ('initr', lambda t: t.initr()),
+    ('invertcolor', lambda t: t.invertcolor(True)),
+    ('image', lambda t: t.image(30, 40, 61, 40, PIXELS)),
+    ('window', window),
+    ('image_rows', lambda t: t.image_rows(26, 1, 29, 4, memoryview(PIXELS), 0, 8)),
+)
+
+
+def record(cls, op):
+    rec = RecSPI()
+    t = cls(rec, 0, 1, 2, size=(106, 160))
+    t.dc = rec.dc
+    t.cs = rec.cs
+    t.reset = RecPin(rec, 'reset')
+    sleep_us = time.sleep_us
+    time.sleep_us = rec.sleep_us
+    try:
+        op(t)
+        rec.frames = rec.writes = 0
+        del rec.stream[:]
+        op(t)
+        frames, writes = rec.frames, rec.writes
+        rec.record = False
+        # Best of a few, the first run can pick up interpreter caches.
+        alloc = min(benchlib.peak_alloc(lambda: op(t)) for i in range(3))
+        rec.frames, rec.writes = frames, writes
+    finally:
+        time.sleep_us = sleep_us
+    return rec, alloc
+
+
+def main():
+    failed = False
+    print('%-12s %-7s %7s %7s %8s %8s' % ('op', 'driver', 'frames', 'writes', 'alloc B', 'bytes'))
+    for name, op in OPS:
+        old, old_alloc = record(LegacyTFT, op)
+        new, new_alloc = record(TFT, op)
+        if new.stream != old.stream:
+            print('MISMATCH %s' % name)
+            failed = True
+        for driver, rec, alloc in (('legacy', old, old_alloc), ('stream', new, new_alloc)):
+            print('%-12s %-7s %7d %7d %8d %8d' % (name, driver, rec.frames, rec.writes, alloc,
+                                                   sum(len(b) for dc, b in rec.stream if dc != 'sleep')))
+        # initr runs once at boot. image_rows slices the pixel rows it is given, the commands
+        # must not add to it.
+        if name != 'initr' and new_alloc > (old_alloc if name == 'image_rows' else 0):
+            print('ALLOC %s: %d B' % (name, new_alloc))
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
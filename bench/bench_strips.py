@@ -0,0 +1,75 @@
+# StripRenderer against the full frame buffer TFTTask, byte-exact on the panel after every step:
+#   python bench/bench_strips.py
+import sys
+
+import benchlib
+
+benchlib.setup_host()
+
+from beeos import Context, OSKernel
+from tft import TFTTask
+
+LINES = (8, 16, 32, 40)
+STEPS = (
+    (TFTTask.TITLE, 'WIFI Ready'),
+    (TFTTask.TEXT_2, 'MEM:42.1%'),
+    (TFTTask.TEXT_3, '2026-10-18'),
+    (TFTTask.BC, TFTTask.BC_TH),
+    (TFTTask.TEXT_1, 'THSensor'),
+    (TFTTask.TEXT_1, 'Clock'),
+    (TFTTask.TITLE, 'WIFI...'),
+    (TFTTask.BC, TFTTask.BC_CLOCK),
+    (TFTTask.TEXT_2, 'MEM:9.5%'),
+    (TFTTask.TEXT_3, ''),
+)
+
+
+def task(lines):
+    t = TFTTask(lines)
+    rec = benchlib.PanelRecorder()
+    t.tft = rec
+    if t.strips is not None:
+        t.strips.tft = rec
+    else:
+        t.buf.tft = rec
+    ctx = Context()
+    ctx.subscribe(t, t.SUBSCRIBE, lambda p: None)
+    ctx.set_var(OSKernel.TICKS_MS, t.last_act)
+    ctx.set_var(TFTTask.TEXT_1, 'Clock')
+    ctx.set_var(TFTTask.TEXT_2, 'MEM:42.0%')
+    ctx.set_var(TFTTask.TEXT_3, '2026-10-17')
+    return t, ctx, rec
+
+
+def run(lines):
+    t, ctx, rec = task(lines)
+    t.loop(ctx)
+    panels = [bytes(rec.panel)]
+    for name, value in STEPS:
+        ctx.set_var(name, value)
+        t.loop(ctx)
+        panels.append(bytes(rec.panel))
+    return t, rec, panels
+
+
+def main():
+    ref_task, ref_rec, ref = run(0)
+    failed = False
+    print('%-10s %10s %10s %10s %10s' % ('renderer', 'RAM B', 'spi B', 'spi wr', 'steps/s'))
+    print('%-10s %10d %10d %10d %10.1f' % ('frame', len(ref_task.buf.buf), ref_rec.bytes, ref_rec.writes,
+                                            benchlib.ops_per_sec(lambda: run(0), min_ops=2) * (len(STEPS) + 1)))
+    for lines in LINES:
+        t, rec, panels = run(lines)
+        for i in range(len(ref)):
+            if panels[i] != ref[i]:
+                print('MISMATCH %d lines at step %d %s' % (lines, i, STEPS[i - 1] if i else 'initial'))
+                failed = True
+                break
+        print('%-10s %10d %10d %10d %10.1f' % ('strip %d' % lines, len(t.strips.buf), rec.bytes, rec.writes,
+                                                benchlib.ops_per_sec(lambda: run(lines), min_ops=2) * (len(STEPS) + 1)))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Rotated 8x16 text in TFTBuf, the old pixel per bit loop against the glyph cache:
+#   python bench/bench_text.py
+import sys
+
+import benchlib
+
+benchlib.setup_host()
+
+from tft import GlyphCache, TFTBuf
+
+TEXT = '2026-10-17'
+
+
+def legacy_text8x16_v(buf, x, y, text, fc, bc=None):
+    # text8x16_v as it was before the glyph cache, kept as the reference.
+    yoffset = y
+    for cc in text:
+        font_m = buf.font.find_font(cc)
+        rows = len(font_m)
+        for ri in range(rows):
+            r = font_m[rows - ri - 1]
+            for i in range(8):
+                if r & (0x80 >> i):
+                    buf.fbuf.pixel(x + ri, yoffset + i, fc)
+                elif bc:
+                    buf.fbuf.pixel(x + ri, yoffset + i, bc)
+        yoffset += 8
+
+
+def main():
+    old, new = TFTBuf(None), TFTBuf(None)
+    cold = TFTBuf(None)
+    new.glyphs.warm(GlyphCache.WARM, 0xFF)
+
+    def cold_draw():
+        cold.glyphs = GlyphCache(cold.font)
+        cold.text8x16_v(60, 6, TEXT, 0xFF)
+
+    cases = (
+        ('transparent', lambda: legacy_text8x16_v(old, 60, 6, TEXT, 0xFF),
+         lambda: new.text8x16_v(60, 6, TEXT, 0xFF)),
+        ('opaque', lambda: legacy_text8x16_v(old, 20, 6, TEXT, 0xFF, 0x1234),
+         lambda: new.text8x16_v(20, 6, TEXT, 0xFF, 0x1234)),
+        ('clipped', lambda: legacy_text8x16_v(old, 70, 100, TEXT, 0xF800),
+         lambda: new.text8x16_v(70, 100, TEXT, 0xF800)),
+        ('cold cache', lambda: legacy_text8x16_v(old, 60, 6, TEXT, 0xFF), cold_draw),
+    )
+    failed = False
+    print('%-14s %14s %14s %8s' % ('case', 'old chars/s', 'new chars/s', 'speedup'))
+    for name, old_fn, new_fn in cases:
+        pattern = b'\xA5\x5A' * (len(old.buf) // 2)
+        old.buf[:] = new.buf[:] = cold.buf[:] = pattern
+        old_fn()
+        new_fn()
+        got = cold if name == 'cold cache' else new
+        if got.buf != old.buf:
+            print('MISMATCH %s' % name)
+            failed = True
+            continue
+        old_cps = benchlib.ops_per_sec(old_fn) * len(TEXT)
+        new_cps = benchlib.ops_per_sec(new_fn) * len(TEXT)
+        print('%-14s %14.1f %14.1f %7.1fx' % (name, old_cps, new_cps, new_cps / old_cps))
+    g = new.glyphs
+    print('glyphs %d/%d, hits %d, misses %d' % (len(g.keys), g.size, g.hits, g.misses))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
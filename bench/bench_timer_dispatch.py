@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'host'))
+import hostenv
+
+hostenv.install()
+
+
+class VirtualClock:
+    def __init__(self):
+        self.ms = 0
+
+    def ticks_ms(self):
+        return self.ms
+
+
+_clock = VirtualClock()
+time.ticks_ms = _clock.ticks_ms
+
+import micropython
+from beeos import Context, Process, TimerOSKernel
+
+TICKS = 2000
+FRQ = 100
+
+
+class WorkTask(Process):
+    def __init__(self):
+        self.runs = 0
+
+    def loop(self, ctx):
+        self.runs += 1
+
+
+def simulate(policy, stall_every, stall_ticks):
+    kernel = TimerOSKernel(Context(), frq=FRQ, deferred=True, policy=policy)
+    task = WorkTask()
+    kernel.exec(task)
+    kernel.run_forever()
+    isr_ns = 0
+    stalled = 0
+    for i in range(TICKS):
+        _clock.ms += FRQ
+        start = time.perf_counter_ns()
+        kernel.timer.fire()
+        isr_ns += time.perf_counter_ns() - start
+        # The main thread is busy (e.g. a long SPI flush) for stall_ticks every stall_every ticks.
+        if stalled:
+            stalled -= 1
+            continue
+        if stall_every and i % stall_every == stall_every - 1:
+            stalled = stall_ticks
+            continue
+        micropython.run_pending()
+    micropython.run_pending()
+    return isr_ns / TICKS / 1000, kernel, task
+
+
+def main():
+    print('%-8s %-12s %8s %8s %8s %8s %10s' % ('policy', 'stall', 'isr us', 'runs', 'missed', 'dropped', 'late max'))
+    for policy, label in ((TimerOSKernel.CATCH_UP, 'catch_up'), (TimerOSKernel.SKIP, 'skip')):
+        for every, ticks in ((0, 0), (50, 3), (50, 12)):
+            isr_us, kernel, task = simulate(policy, every, ticks)
+            stall = '%d/%d' % (ticks, every) if every else 'none'
+            print('%-8s %-12s %8.2f %8d %8d %8d %8d ms' % (
+                label, stall, isr_us, task.runs, kernel.missed, kernel.dropped, kernel.latency_max))
+
+
+if __name__ == '__main__':
+    main()
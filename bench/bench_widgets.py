@@ -0,0 +1,82 @@
+# Screen widgets: what one render sends after a single widget changes, against a full frame.
+#   python bench/bench_widgets.py
+# After every step the frame buffer must equal a fresh screen rendered from scratch with the
+# same values, so invalidation never leaves stale pixels behind.
+import sys
+
+import benchlib
+
+benchlib.setup_host()
+
+from tft import Bar, Icon, Label, Screen, Sparkline, TFTBuf, TFTTask
+
+ICON = 'icon_keqin.data'
+STEPS = (
+    ('label', 'MEM:42.1%'),
+    ('bar', 35),
+    ('bar', 80),
+    ('bar', 10),
+    ('spark', (3, 5, 4, 8, 6, 9, 7)),
+    ('spark', (5, 4, 8, 6, 9, 7, 2)),
+    ('icon', None),
+    ('title', 'WIFI...'),
+    ('icon', ICON),
+    ('label', 'MEM:9.5%'),
+    ('bg', TFTTask.BC_TH),
+    ('title', ''),
+)
+
+
+def layout():
+    screen = Screen(TFTTask.BC_CLOCK)
+    w = {
+        'label': screen.add(Label(60, 6, 16, 74, 0xFF, text='MEM:42.0%')),
+        'bar': screen.add(Bar(4, 6, 8, 70, 0x00F8, 0xFFFF)),
+        'spark': screen.add(Sparkline(20, 6, 30, 70, 0xE007, 0, 10)),
+        'icon': screen.add(Icon(0, 80, 80, 80)),
+        'title': screen.add(Label(0, 150, 80, 8, 0, text='WIFI Ready')),
+    }
+    w['bar'].set(60)
+    w['spark'].set((1, 3, 2, 5, 4, 8, 6))
+    w['icon'].set(ICON)
+    return screen, w
+
+
+def apply(screen, w, name, value):
+    if name == 'bg':
+        screen.bg = value
+    else:
+        w[name].set(value)
+
+
+def main():
+    rec = benchlib.PanelRecorder()
+    buf = TFTBuf(rec)
+    screen, w = layout()
+    screen.render(buf)
+    buf.show()
+    values = []
+    failed = False
+    print('%-8s %-26s %10s %8s %10s' % ('widget', 'value', 'spi B', 'writes', 'vs full'))
+    for name, value in STEPS:
+        apply(screen, w, name, value)
+        values.append((name, value))
+        b, n = rec.bytes, rec.writes
+        screen.render(buf)
+        buf.show()
+        ref_screen, ref_w = layout()
+        for v in values:
+            apply(ref_screen, ref_w, *v)
+        ref = TFTBuf(None)
+        ref_screen.render(ref)
+        if ref.buf != buf.buf:
+            print('MISMATCH after %s %r' % (name, value))
+            failed = True
+        print('%-8s %-26s %10d %8d %9.1f%%' % (name, repr(value), rec.bytes - b, rec.writes - n,
+                                               100.0 * (rec.bytes - b) / len(buf.buf)))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'host'))
+import hostenv
+
+
+def setup_host(quiet=True):
+    hostenv.install()
+    # Assets are opened by relative name like on the device.
+    os.chdir(hostenv.WORKSPACE)
+    if quiet:
+        import log
+        log.Log.log = lambda self, level, msg, e=None: None
+
+
+def ops_per_sec(fn, min_time=0.3, min_ops=3):
+    fn()
+    n = 0
+    start = time.perf_counter()
+    end = start + min_time
+    while True:
+        fn()
+        n += 1
+        now = time.perf_counter()
+        if n >= min_ops and now >= end:
+            return n / (now - start)
+
+
+def peak_alloc(fn):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def alloc_count(fn):
+    # Number of allocations still alive or made during fn, counted by tracemalloc blocks.
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        fn()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    return sum(max(d.count_diff, 0) for d in after.compare_to(before, 'lineno'))
+
+
+class PanelRecorder:
+    # The TFT calls TFTBuf.show uses, writing pixels into a panel sized bytearray.
+    def __init__(self):
+        self.panel = bytearray(132 * 162 * 2)
+        self.writes = 0
+        self.bytes = 0
+
+    def window_begin(self, x0, y0, x1, y1):
+        self.win = (x0, y0, x1 - x0 + 1)
+        self.pos = 0
+
+    def window_write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+        x0, y0, w = self.win
+        for i in range(0, len(data), 2):
+            p = self.pos + i // 2
+            o = ((y0 + p // w) * 132 + x0 + p % w) * 2
+            self.panel[o:o + 2] = data[i:i + 2]
+        self.pos += len(data) // 2
+
+    def window_end(self):
+        pass
+
+    def image(self, x0, y0, x1, y1, data):
+        self.window_begin(x0, y0, x1, y1)
+        self.window_write(data)
+
+    def image_rows(self, x0, y0, x1, y1, data, offset, stride):
+        self.window_begin(x0, y0, x1, y1)
+        n = (x1 - x0 + 1) * 2
+        for i in range(y1 - y0 + 1):
+            self.window_write(data[offset:offset + n])
+            offset += stride
+
+
+class PanelSim:
+    # SPI bus plus DC and CS pins of an ST7735, emulating its frame memory for the window,
+    # scroll and partial mode commands. Hand it to TFT as spi and set tft.dc/tft.cs to dc/cs.
+    COLS = 132
+    ROWS = 162
+    ARGS = {0x2A: 4, 0x2B: 4, 0x30: 4, 0x33: 6, 0x37: 2}
+
+    def __init__(self):
+        self.mem = bytearray(self.COLS * self.ROWS * 2)
+        self.dc = self.Pin()
+        self.cs = self.Pin()
+        self.writes = 0
+        self.bytes = 0
+        self.cmd = None
+        self.args = b''
+        self.cols = (0, self.COLS - 1)
+        self.rows = (0, self.ROWS - 1)
+        self.pos = 0
+        self.tfa, self.vsa, self.ssa = 0, self.ROWS, 0
+        self.prange = (0, self.ROWS - 1)
+        self.partial = None
+
+    class Pin:
+        def __init__(self):
+            self.v = 1
+
+        def __call__(self, v=None):
+            if v is None:
+                return self.v
+            self.v = v
+
+    def write(self, buf):
+        assert not self.cs.v, 'write with CS high'
+        self.writes += 1
+        self.bytes += len(buf)
+        if not self.dc.v:
+            for c in bytes(buf):
+                self.cmd = c
+                self.args = b''
+                self.pos = 0
+                if c == 0x12:
+                    self.partial = self.prange
+                elif c == 0x13:
+                    self.partial = None
+            return
+        if self.cmd == 0x2C:
+            self._pixels(bytes(buf))
+            return
+        self.args += bytes(buf)
+        if len(self.args) == self.ARGS.get(self.cmd):
+            a = [(self.args[i] << 8) | self.args[i + 1] for i in range(0, len(self.args), 2)]
+            if self.cmd == 0x2A:
+                self.cols = tuple(a)
+            elif self.cmd == 0x2B:
+                self.rows = tuple(a)
+            elif self.cmd == 0x30:
+                self.prange = tuple(a)
+            elif self.cmd == 0x33:
+                self.tfa, self.vsa = a[0], a[1]
+            elif self.cmd == 0x37:
+                self.ssa = a[0]
+
+    def _pixels(self, data):
+        x0, x1 = self.cols
+        y0, y1 = self.rows
+        w = x1 - x0 + 1
+        i = 0
+        while i < len(data):
+            # The rest of the current window row at a time.
+            p = self.pos
+            n = min(w - p % w, (len(data) - i) // 2)
+            o = ((y0 + p // w) * self.COLS + x0 + p % w) * 2
+            self.mem[o:o + n * 2] = data[i:i + n * 2]
+            self.pos += n
+            i += n * 2
+
+    def row(self, r):
+        # Frame memory row shown on panel row r.
+        if self.tfa <= r < self.tfa + self.vsa:
+            return self.tfa + (r - self.tfa + self.ssa - self.tfa) % self.vsa
+        return r
+
+    def visible(self, x0=0, y0=0, w=COLS, h=ROWS):
+        # What the panel shows in the given window, blank rows outside a partial area.
+        out = bytearray()
+        for r in range(y0, y0 + h):
+            if self.partial is not None and not self.partial[0] <= r <= self.partial[1]:
+                out += bytes(w * 2)
+                continue
+            o = (self.row(r) * self.COLS + x0) * 2
+            out += self.mem[o:o + w * 2]
+        return bytes(out)
+
+
+def reference():
+    # Fixed pure Python work, timings relative to it leave out how fast the host is right now.
+    s = 0
+    for i in range(500):
+        s += i * i & 0xFF
+    return s
+
+
+def relative_ops(fn):
+    # ops/sec of fn over ops/sec of reference, measured back to back.
+    ops = ops_per_sec(fn)
+    return ops, ops / ops_per_sec(reference)
+
+
+class Suite:
+    # Compares results against a saved baseline. More SPI bytes, pixel writes or
+    # allocations than recorded count as a regression. Host timings are too noisy to
+    # gate on, ops/sec and the rate relative to reference() are only reported.
+    def __init__(self, name, baseline):
+        self.name = name
+        self.baseline_path = baseline
+        self.results = {}
+
+    def add(self, case, ops, spi=0, alloc=0, **extra):
+        res = {'ops': round(ops, 1), 'spi': spi, 'alloc': alloc}
+        res.update(extra)
+        self.results[case] = res
+
+    def load(self):
+        if not os.path.exists(self.baseline_path):
+            return {}
+        with open(self.baseline_path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def moved(ref, res):
+        # Counters differ, allocations by more than the slack compare() allows.
+        return res['spi'] != ref['spi'] or res.get('pixels', 0) != ref.get('pixels', 0) or \
+            abs(res['alloc'] - ref['alloc']) > ref['alloc'] * 0.25 + 256
+
+    def save(self, cases=None):
+        # Updates the given cases, by default only new ones and those whose counters moved,
+        # so untouched cases keep their recorded timings. Returns the updated names.
+        base = self.load()
+        saved = []
+        for case, res in self.results.items():
+            ref = base.get(case)
+            if cases is None and ref is not None and not self.moved(ref, res):
+                continue
+            if cases is not None and case not in cases:
+                continue
+            base[case] = res
+            saved.append(case)
+        with open(self.baseline_path, 'w') as f:
+            json.dump(base, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return saved
+
+    def compare(self):
+        base = self.load()
+        failures = []
+        print('%-26s %12s %10s %10s %10s %10s' % ('case', 'ops/sec', 'rel vs base', 'spi B/op', 'pixels/op',
+                                                 'alloc B'))
+        for case, res in self.results.items():
+            ref = base.get(case)
+            ratio = ''
+            if ref:
+                if ref.get('rel') and res.get('rel'):
+                    ratio = '%.2fx' % (res['rel'] / ref['rel'])
+                if res.get('pixels', 0) > ref.get('pixels', 0):
+                    failures.append('%s: %d pixels/op, baseline %d' % (case, res['pixels'], ref['pixels']))
+                if res['spi'] > ref['spi']:
+                    failures.append('%s: %d SPI bytes/op, baseline %d' % (case, res['spi'], ref['spi']))
+                if res['alloc'] > ref['alloc'] * 1.25 + 256:
+                    failures.append('%s: %d bytes allocated, baseline %d' % (case, res['alloc'], ref['alloc']))
+            print('%-26s %12.1f %10s %10d %10d %10d' % (
+                case, res['ops'], ratio, res['spi'], res.get('pixels', 0), res['alloc']))
+        return failures
+
+
+def main_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--save', action='store_true',
+                        help='record new cases and those whose counters moved, or the --only cases')
+    parser.add_argument('--only', default='', help='run cases whose name contains this')
+    return parser.parse_args(argv)
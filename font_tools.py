@@ -1,7 +1,148 @@
-def main():
-    with open('workSpace/ascii.font', 'rb') as f:
+import argparse
+import os
+import struct
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Packed font file, little endian:
+#   header  MAGIC, VERSION, face count, reserved                 '<4sBBH'
+#   faces   height, widest glyph, glyph count, index offset      '<BBHI' each
+#   index   code, width, reserved, bitmap offset                 '<HBBI' each, sorted by code
+#   glyphs  MONO_HLSB bitmaps already rotated for TFTBuf: `height` pixels across (x), `width`
+#           rows down (y), so a string runs down the panel like TFTBuf.text8x16_v.
+MAGIC = b'BFNT'
+VERSION = 1
+HEADER = '<4sBBH'
+FACE = '<BBHI'
+ENTRY = '<HBBI'
+
+ASCII = ''.join(chr(c) for c in range(32, 127))
+
+
+def rotate(img):
+    # Glyph row r, column c lands on (h - 1 - r, c), text8x16_v's orientation.
+    w, h = img.size
+    rot = Image.new('1', (h, w))
+    for y in range(w):
+        for x in range(h):
+            rot.putpixel((x, y), img.getpixel((y, h - 1 - x)))
+    return rot
+
+
+def raster_ttf(src, size, chars):
+    font = ImageFont.truetype(src, size)
+    ascent, descent = font.getmetrics()
+    h = ascent + descent
+    glyphs = []
+    for c in chars:
+        w = max(1, int(round(font.getlength(c))))
+        img = Image.new('1', (w, h))
+        draw = ImageDraw.Draw(img)
+        draw.fontmode = '1'
+        draw.text((0, 0), c, font=font, fill=1)
+        glyphs.append((c, img))
+    return h, glyphs
+
+
+def raster_bdf(src, chars):
+    from PIL import BdfFontFile
+    with open(src, 'rb') as f:
+        bdf = BdfFontFile.BdfFontFile(f)
+    # Cell from the bounding boxes of the requested glyphs, baseline at the same row for all.
+    found = [(c, bdf.glyph[ord(c)]) for c in chars if ord(c) < len(bdf.glyph) and bdf.glyph[ord(c)]]
+    top = max(-g[1][1] for c, g in found)
+    bottom = max(g[1][3] for c, g in found)
+    h = top + bottom
+    glyphs = []
+    for c, ((dx, dy), bbox, src_box, im) in found:
+        img = Image.new('1', (max(1, dx), h))
+        img.paste(im.convert('1'), (bbox[0], top + bbox[1]))
+        glyphs.append((c, img))
+    return h, glyphs
+
+
+def raster_raw(src, chars):
+    # ascii.font: 16 bytes per glyph, one per row, codes 32..126.
+    with open(src, 'rb') as f:
+        data = f.read()
+    glyphs = []
+    for c in chars:
+        i = ord(c) - 32
+        if i < 0 or (i + 1) * 16 > len(data):
+            continue
+        img = Image.new('1', (8, 16))
+        for r in range(16):
+            row = data[i * 16 + r]
+            for x in range(8):
+                if row & (0x80 >> x):
+                    img.putpixel((x, r), 1)
+        glyphs.append((c, img))
+    return 16, glyphs
+
+
+def raster(src, sizes, chars):
+    ext = os.path.splitext(src)[1].lower()
+    if ext in ('.ttf', '.otf'):
+        return [raster_ttf(src, s, chars) for s in sizes]
+    # Bitmap fonts come in their own size.
+    if ext == '.bdf':
+        return [raster_bdf(src, chars)]
+    return [raster_raw(src, chars)]
+
+
+def pack(faces):
+    head = struct.calcsize(HEADER) + struct.calcsize(FACE) * len(faces)
+    index_size = sum(struct.calcsize(ENTRY) * len(g) for h, g in faces)
+    offset = head
+    face_recs = []
+    entries = b''
+    bitmaps = b''
+    data_off = head + index_size
+    for h, glyphs in faces:
+        glyphs = sorted(glyphs, key=lambda g: ord(g[0]))
+        face_recs.append(struct.pack(FACE, h, max(img.size[0] for c, img in glyphs), len(glyphs), offset))
+        for c, img in glyphs:
+            bits = rotate(img).tobytes()
+            entries += struct.pack(ENTRY, ord(c), img.size[0], 0, data_off + len(bitmaps))
+            bitmaps += bits
+        offset += struct.calcsize(ENTRY) * len(glyphs)
+    return struct.pack(HEADER, MAGIC, VERSION, len(faces), 0) + b''.join(face_recs) + entries + bitmaps
+
+
+def compile_font(args):
+    chars = args.chars or ASCII
+    faces = raster(args.src, args.size or [16], chars)
+    out = pack(faces)
+    with open(args.out, 'wb') as f:
+        f.write(out)
+    for h, glyphs in faces:
+        print('%s: %d px, %d glyphs' % (args.out, h, len(glyphs)))
+    print('%d bytes' % len(out))
+
+
+def dump(args):
+    with open(args.file, 'rb') as f:
         print(f.read())
 
 
+def main():
+    parser = argparse.ArgumentParser(description='Font tools for the TFT.')
+    sub = parser.add_subparsers(dest='cmd')
+    c = sub.add_parser('compile', help='compile a TTF/OTF, BDF or ascii.font into a packed font')
+    c.add_argument('src')
+    c.add_argument('-o', '--out', required=True)
+    c.add_argument('-s', '--size', type=int, action='append', help='pixel size, TTF only, repeatable')
+    c.add_argument('-c', '--chars', help='characters to include, printable ASCII by default')
+    d = sub.add_parser('dump', help='print the raw bytes of a font file')
+    d.add_argument('file', nargs='?', default='workSpace/ascii.font')
+    args = parser.parse_args()
+    if args.cmd == 'compile':
+        compile_font(args)
+    else:
+        if args.cmd is None:
+            args.file = 'workSpace/ascii.font'
+        dump(args)
+
+
 if __name__ == '__main__':
     main()
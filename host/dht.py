@@ -0,0 +1,44 @@
+import math
+
+import vclock
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class DHTBase:
+    # Virtual time one measurement blocks the caller.
+    MEASURE_MS = 25
+    T_MEAN = 22.0
+    T_SWING = 4.0
+    H_MEAN = 45.0
+    H_SWING = 10.0
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.measures = 0
+        self._t = 0.0
+        self._h = 0.0
+
+    def measure(self):
+        clock = vclock.current()
+        clock.sleep_us(self.MEASURE_MS * 1000)
+        phase = 2 * math.pi * (clock.ticks_ms() % DAY_MS) / DAY_MS
+        self._t = self.T_MEAN + self.T_SWING * math.sin(phase)
+        self._h = self.H_MEAN + self.H_SWING * math.cos(phase)
+        self.measures += 1
+
+
+class DHT11(DHTBase):
+    def temperature(self):
+        return int(self._t)
+
+    def humidity(self):
+        return int(self._h)
+
+
+class DHT22(DHTBase):
+    def temperature(self):
+        return round(self._t, 1)
+
+    def humidity(self):
+        return round(self._h, 1)
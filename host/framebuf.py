@@ -0,0 +1,256 @@
+import os
+
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+RGB565 = 1
+GS2_HMSB = 5
+GS4_HMSB = 2
+GS8 = 6
+MVLSB = MONO_VLSB
+
+_FONT = None
+
+
+def _font():
+    # 8x8 glyphs for text(), folded from the 8x16 ascii.font rows (column bytes, LSB on top).
+    global _FONT
+    if _FONT is not None:
+        return _FONT
+    glyphs = {}
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'workSpace', 'ascii.font')
+    data = b''
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+    for i in range(len(data) // 16):
+        rows = data[i * 16:i * 16 + 16]
+        cols = bytearray(8)
+        for r in range(8):
+            row = rows[r * 2] | rows[r * 2 + 1]
+            for c in range(8):
+                if row & (0x80 >> c):
+                    cols[c] |= 1 << r
+        glyphs[32 + i] = bytes(cols)
+    _FONT = glyphs
+    return _FONT
+
+
+class FrameBuffer:
+    # Pixels written through any FrameBuffer, for the render benchmarks.
+    pixel_writes = 0
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        self.buf = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        stride = width if stride is None else stride
+        if format == MONO_HLSB or format == MONO_HMSB:
+            stride = (stride + 7) & ~7
+        self.stride = stride
+        need = self._size()
+        if len(buffer) < need:
+            raise ValueError('buffer too small')
+        self._mv = memoryview(buffer)
+        self._mv16 = None
+
+    def _size(self):
+        f = self.format
+        if f == RGB565:
+            return self.stride * self.height * 2
+        if f == GS8:
+            return self.stride * self.height
+        if f == GS4_HMSB:
+            return (self.stride * self.height + 1) >> 1
+        if f == GS2_HMSB:
+            return (self.stride * self.height + 3) >> 2
+        if f == MONO_VLSB:
+            return self.stride * ((self.height + 7) >> 3)
+        return (self.stride * self.height) >> 3
+
+    def _set(self, x, y, c):
+        f = self.format
+        buf = self.buf
+        if f == RGB565:
+            i = (x + y * self.stride) * 2
+            buf[i] = c & 0xFF
+            buf[i + 1] = (c >> 8) & 0xFF
+        elif f == GS8:
+            buf[x + y * self.stride] = c & 0xFF
+        elif f == GS4_HMSB:
+            i = (x + y * self.stride) >> 1
+            if x & 1:
+                buf[i] = (c & 0x0F) | (buf[i] & 0xF0)
+            else:
+                buf[i] = ((c & 0x0F) << 4) | (buf[i] & 0x0F)
+        elif f == GS2_HMSB:
+            i = (x + y * self.stride) >> 2
+            shift = (x & 3) << 1
+            buf[i] = (buf[i] & ~(0x03 << shift) & 0xFF) | ((c & 0x03) << shift)
+        elif f == MONO_VLSB:
+            i = (y >> 3) * self.stride + x
+            bit = 1 << (y & 7)
+            buf[i] = (buf[i] | bit) if c else (buf[i] & ~bit & 0xFF)
+        else:
+            i = (x + y * self.stride) >> 3
+            bit = (0x80 >> (x & 7)) if f == MONO_HLSB else (1 << (x & 7))
+            buf[i] = (buf[i] | bit) if c else (buf[i] & ~bit & 0xFF)
+
+    def _get(self, x, y):
+        f = self.format
+        buf = self.buf
+        if f == RGB565:
+            i = (x + y * self.stride) * 2
+            return buf[i] | (buf[i + 1] << 8)
+        if f == GS8:
+            return buf[x + y * self.stride]
+        if f == GS4_HMSB:
+            b = buf[(x + y * self.stride) >> 1]
+            return b & 0x0F if x & 1 else b >> 4
+        if f == GS2_HMSB:
+            return (buf[(x + y * self.stride) >> 2] >> ((x & 3) << 1)) & 0x03
+        if f == MONO_VLSB:
+            return (buf[(y >> 3) * self.stride + x] >> (y & 7)) & 1
+        b = buf[(x + y * self.stride) >> 3]
+        bit = (0x80 >> (x & 7)) if f == MONO_HLSB else (1 << (x & 7))
+        return 1 if b & bit else 0
+
+    def pixel(self, x, y, c=None):
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return None
+        if c is None:
+            return self._get(x, y)
+        FrameBuffer.pixel_writes += 1
+        self._set(x, y, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        FrameBuffer.pixel_writes += (x1 - x0) * (y1 - y0)
+        if self.format == RGB565:
+            line = bytes((c & 0xFF, (c >> 8) & 0xFF)) * (x1 - x0)
+            for yy in range(y0, y1):
+                i = (x0 + yy * self.stride) * 2
+                self.buf[i:i + len(line)] = line
+        elif self.format == GS8:
+            line = bytes((c & 0xFF,)) * (x1 - x0)
+            for yy in range(y0, y1):
+                i = x0 + yy * self.stride
+                self.buf[i:i + len(line)] = line
+        else:
+            for yy in range(y0, y1):
+                for xx in range(x0, x1):
+                    self._set(xx, yy, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def text(self, s, x, y, c=1):
+        font = _font()
+        for ch in s:
+            glyph = font.get(ord(ch)) or font.get(127) or bytes(8)
+            for col in range(8):
+                bits = glyph[col]
+                xx = x + col
+                for row in range(8):
+                    if bits & (1 << row):
+                        self.pixel(xx, y + row, c)
+            x += 8
+
+    def scroll(self, xstep, ystep):
+        w = self.width
+        h = self.height
+        ys = range(h - 1, -1, -1) if ystep > 0 else range(h)
+        xs = range(w - 1, -1, -1) if xstep > 0 else range(w)
+        for yy in ys:
+            sy = yy - ystep
+            if sy < 0 or sy >= h:
+                continue
+            for xx in xs:
+                sx = xx - xstep
+                if 0 <= sx < w:
+                    self._set(xx, yy, self._get(sx, sy))
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        if isinstance(fbuf, tuple):
+            fbuf = FrameBuffer(*fbuf)
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + fbuf.width, self.width)
+        y1 = min(y + fbuf.height, self.height)
+        if palette is None and self.format == RGB565 and fbuf.format == RGB565 and x0 < x1:
+            self._blit565(fbuf, x, y, x0, y0, x1, y1, key)
+            return
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                c = fbuf._get(xx - x, yy - y)
+                if palette is not None:
+                    c = palette._get(c, 0)
+                if c != key:
+                    FrameBuffer.pixel_writes += 1
+                    self._set(xx, yy, c)
+
+    def _view16(self):
+        if self._mv16 is None:
+            self._mv16 = self._mv[:self._size()].cast('H')
+        return self._mv16
+
+    def _blit565(self, fbuf, x, y, x0, y0, x1, y1, key):
+        # Row at a time on 16-bit views, closer to the cost of the C blit than _get/_set per pixel.
+        dst = self._view16()
+        src = fbuf._view16()
+        n = x1 - x0
+        for yy in range(y0, y1):
+            d = x0 + yy * self.stride
+            s = x0 - x + (yy - y) * fbuf.stride
+            if key == -1:
+                dst[d:d + n] = src[s:s + n]
+                FrameBuffer.pixel_writes += n
+                continue
+            for i in range(n):
+                c = src[s + i]
+                if c != key:
+                    dst[d + i] = c
+                    FrameBuffer.pixel_writes += 1
+
+
+def FrameBuffer1(buffer, width, height, format=MONO_VLSB, stride=None):
+    return FrameBuffer(buffer, width, height, format, stride)
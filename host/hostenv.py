@@ -0,0 +1,48 @@
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKSPACE = os.path.join(ROOT, 'workSpace')
+HOST = os.path.join(ROOT, 'host')
+
+if HOST not in sys.path:
+    sys.path.insert(0, HOST)
+
+import vclock
+
+# ESP32 MicroPython heap size the gc stand-ins report against.
+HEAP_SIZE = 111168
+_trace_heap = True
+
+
+def _mem_alloc():
+    import tracemalloc
+    if _trace_heap and tracemalloc.is_tracing():
+        return min(tracemalloc.get_traced_memory()[0], HEAP_SIZE)
+    return 0
+
+
+def install(clock=None, trace_heap=True):
+    # MicroPython only time and gc functions, mapped onto a host or virtual clock. With
+    # trace_heap the gc stand-ins count what tracemalloc traces against HEAP_SIZE.
+    global _trace_heap
+    _trace_heap = trace_heap
+    if clock is None:
+        clock = vclock.RealClock()
+    vclock.set_current(clock)
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    time.ticks_cpu = clock.ticks_us
+    time.ticks_add = lambda t, d: t + d
+    time.ticks_diff = lambda a, b: a - b
+    time.sleep_ms = lambda ms: clock.sleep_us(ms * 1000)
+    time.sleep_us = clock.sleep_us
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free = lambda: HEAP_SIZE - _mem_alloc()
+    for p in (WORKSPACE, HOST):
+        if p in sys.path:
+            sys.path.remove(p)
+        sys.path.insert(0, p)
+    return clock
@@ -0,0 +1,172 @@
+import calendar
+import time
+
+import vclock
+
+
+def unique_id():
+    return b'\x24\x0a\xc4\x00\x00\x01'
+
+
+def freq(hz=None):
+    return 240000000
+
+
+def lightsleep(ms=0):
+    vclock.current().sleep_us(ms * 1000)
+
+
+def deepsleep(ms=0):
+    vclock.current().sleep_us(ms * 1000)
+
+
+def idle():
+    pass
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self.pull = pull
+        self._value = value or 0
+        self._irq = None
+        self._trigger = 0
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = 1 if v else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def irq(self, handler=None, trigger=IRQ_RISING | IRQ_FALLING):
+        self._irq = handler
+        self._trigger = trigger
+
+    def drive(self, v):
+        # Host side: change an input level and fire the IRQ like the hardware would.
+        v = 1 if v else 0
+        if v == self._value:
+            return
+        self._value = v
+        edge = Pin.IRQ_RISING if v else Pin.IRQ_FALLING
+        if self._irq and (self._trigger & edge):
+            self._irq(self)
+
+
+class PWM:
+    def __init__(self, pin, freq=5000, duty=0):
+        self.pin = pin
+        self._freq = freq
+        self._duty = duty
+
+    def freq(self, f=None):
+        if f is None:
+            return self._freq
+        self._freq = f
+
+    def duty(self, d=None):
+        if d is None:
+            return self._duty
+        self._duty = d
+
+    def deinit(self):
+        self._duty = 0
+
+
+class SPI:
+    # Set capture to a bytearray to record every byte written, timed to block each write
+    # for as long as the bytes take on the bus.
+    def __init__(self, id, baudrate=1000000, polarity=0, phase=0, sck=None, mosi=None, miso=None):
+        self.id = id
+        self.baudrate = baudrate
+        self.writes = 0
+        self.bytes = 0
+        self.capture = None
+        self.timed = False
+
+    def init(self, baudrate=1000000, **kwargs):
+        self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        self.writes += 1
+        self.bytes += len(buf)
+        if self.capture is not None:
+            self.capture.extend(buf)
+        if self.timed:
+            vclock.current().sleep_us(len(buf) * 8 * 1000000 // self.baudrate)
+
+    def read(self, nbytes, write=0):
+        return bytes([write]) * nbytes
+
+    def readinto(self, buf, write=0):
+        for i in range(len(buf)):
+            buf[i] = write
+
+    def write_readinto(self, write_buf, read_buf):
+        self.write(write_buf)
+        self.readinto(read_buf)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id):
+        self.id = id
+        self.callback = None
+        self.period = 0
+        self.mode = Timer.PERIODIC
+        self._gen = 0
+
+    def init(self, mode=PERIODIC, period=-1, callback=None):
+        self.mode = mode
+        self.period = period
+        self.callback = callback
+        vclock.current().add_timer(self)
+
+    def deinit(self):
+        self.callback = None
+        vclock.current().remove_timer(self)
+
+    def fire(self):
+        if self.callback:
+            self.callback(self)
+
+
+class RTC:
+    # Offset (seconds) between the RTC and the clock's true wall time, shared like the hardware RTC.
+    _offset = None
+    BOOT_TIME = 946684800
+
+    def __init__(self):
+        if RTC._offset is None:
+            RTC._offset = RTC.BOOT_TIME - vclock.current().wall()
+
+    def datetime(self, dt=None):
+        wall = vclock.current().wall()
+        if dt is None:
+            now = wall + RTC._offset
+            t = time.gmtime(int(now))
+            return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_wday, t.tm_hour, t.tm_min, t.tm_sec,
+                    int((now % 1) * 1000000))
+        secs = calendar.timegm((dt[0], dt[1], dt[2], dt[4], dt[5], dt[6], 0, 0, 0))
+        RTC._offset = secs + dt[7] / 1000000 - wall
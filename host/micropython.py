@@ -0,0 +1,38 @@
+# Pending scheduled callbacks, MicroPython runs them between bytecodes of the main thread.
+SCHED_DEPTH = 8
+_queue = []
+
+
+def const(v):
+    return v
+
+
+def schedule(func, arg):
+    if len(_queue) >= SCHED_DEPTH:
+        raise RuntimeError('schedule queue full')
+    _queue.append((func, arg))
+
+
+def run_pending():
+    n = 0
+    while _queue:
+        func, arg = _queue.pop(0)
+        func(arg)
+        n += 1
+    return n
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=None):
+    pass
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
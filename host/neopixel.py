@@ -0,0 +1,34 @@
+class NeoPixel:
+    ORDER = (1, 0, 2, 3)
+    # Pixels set through any NeoPixel, for the render benchmarks.
+    pixel_writes = 0
+
+    def __init__(self, pin, n, bpp=3, timing=1):
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.timing = timing
+        self.buf = bytearray(n * bpp)
+        self.writes = 0
+        self.bytes = 0
+
+    def __len__(self):
+        return self.n
+
+    def __setitem__(self, i, v):
+        NeoPixel.pixel_writes += 1
+        offset = i * self.bpp
+        for b in range(self.bpp):
+            self.buf[offset + self.ORDER[b]] = v[b]
+
+    def __getitem__(self, i):
+        offset = i * self.bpp
+        return tuple(self.buf[offset + self.ORDER[b]] for b in range(self.bpp))
+
+    def fill(self, v):
+        for i in range(self.n):
+            self[i] = v
+
+    def write(self):
+        self.writes += 1
+        self.bytes += len(self.buf)
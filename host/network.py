@@ -0,0 +1,62 @@
+import vclock
+
+STA_IF = 0
+AP_IF = 1
+AUTH_OPEN = 0
+AUTH_WPA_WPA2_PSK = 4
+# Virtual time an access point takes to accept a connection.
+CONNECT_MS = 3000
+_sta_up = False
+
+
+def sta_connected():
+    return _sta_up
+
+
+class WLAN:
+    def __init__(self, interface_id=STA_IF):
+        self.interface_id = interface_id
+        self._active = False
+        self._connect_at = None
+        self._config = {}
+        self._ifconfig = ('0.0.0.0', '0.0.0.0', '0.0.0.0', '0.0.0.0')
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = is_active
+        if not is_active:
+            self.disconnect()
+
+    def connect(self, ssid=None, password=None):
+        if self._active:
+            self._connect_at = vclock.current().ticks_ms() + CONNECT_MS
+
+    def disconnect(self):
+        global _sta_up
+        self._connect_at = None
+        if self.interface_id == STA_IF:
+            _sta_up = False
+
+    def isconnected(self):
+        global _sta_up
+        up = self._connect_at is not None and vclock.current().ticks_ms() >= self._connect_at
+        if self.interface_id == STA_IF:
+            _sta_up = up
+        return up
+
+    def status(self, param=None):
+        return 1010 if self.isconnected() else 1001
+
+    def scan(self):
+        return []
+
+    def config(self, *args, **kwargs):
+        self._config.update(kwargs)
+        if args:
+            return self._config.get(args[0])
+
+    def ifconfig(self, cfg=None):
+        if cfg is None:
+            return self._ifconfig
+        self._ifconfig = cfg
@@ -0,0 +1,26 @@
+import network
+import vclock
+from machine import RTC
+
+host = 'pool.ntp.org'
+timeout = 1
+NTP_DELTA = 3155673600
+# Virtual time one NTP round trip takes.
+RTT_MS = 40
+syncs = 0
+
+
+def time():
+    if not network.sta_connected():
+        raise OSError(116)
+    clock = vclock.current()
+    clock.sleep_us(RTT_MS * 1000)
+    return int(clock.wall())
+
+
+def settime():
+    global syncs
+    import time as _time
+    t = _time.gmtime(time())
+    RTC().datetime((t.tm_year, t.tm_mon, t.tm_mday, t.tm_wday + 1, t.tm_hour, t.tm_min, t.tm_sec, 0))
+    syncs += 1
@@ -0,0 +1,112 @@
+# Runs bootstrap.Entry on CPython against the host stand-ins with a virtual clock:
+#   python host/sim.py --hours 24 --quiet
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import hostenv
+import vclock
+
+HOUR_MS = 60 * 60 * 1000
+
+
+class Simulator:
+    def __init__(self, epoch=None):
+        # The run is traced for the report, CPython objects are far larger than on the device
+        # and would leave the firmware a full heap, so gc keeps reporting it free.
+        self.clock = hostenv.install(vclock.VirtualClock(epoch), trace_heap=False)
+        self.entry = None
+        # workSpace/ plays the device filesystem, assets are opened by relative name.
+        os.chdir(hostenv.WORKSPACE)
+
+    def at(self, ms, fn):
+        self.clock.at(ms, fn)
+
+    def press(self, ms, btn, hold_ms=100):
+        from board_driver import Buttons
+        pin = Buttons.get().btns[btn]
+        self.at(ms, lambda: pin.drive(0))
+        self.at(ms + hold_ms, lambda: pin.drive(1))
+
+    def wakeup(self, ms, hold_ms=5000):
+        from board_driver import WAKEUP
+        self.at(ms, lambda: WAKEUP.drive(1))
+        self.at(ms + hold_ms, lambda: WAKEUP.drive(0))
+
+    def run(self, ms):
+        from board_driver import Buttons
+        for pin in Buttons.get().btns.values():
+            pin.value(1)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        from bootstrap import Entry
+        self.clock.stop_at(ms)
+        self.entry = Entry()
+        try:
+            self.entry.start()
+        except vclock.StopSimulation:
+            pass
+        return self.entry
+
+    def report(self):
+        import ntptime
+        from led_display import _np1, _np2, _np3
+        entry = self.entry
+        tft = entry.skernel.get_var('tft_task')
+        spi = tft.tft.spi
+        alloc, peak = tracemalloc.get_traced_memory()
+        res = [
+            ('virtual time', '%.2f h' % (self.clock.ticks_ms() / HOUR_MS)),
+            ('timer ticks', entry.tkernel.ticks),
+            ('missed ticks', entry.tkernel.missed),
+            ('irq fired', self.clock.fired),
+            ('spi writes', spi.writes),
+            ('spi bytes', spi.bytes),
+            ('neopixel writes', _np1.writes + _np2.writes + _np3.writes),
+            ('ntp syncs', ntptime.syncs),
+            ('host alloc', '%d B' % alloc),
+            ('host alloc peak', '%d B' % peak),
+        ]
+        return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the SuperClock firmware on the host.')
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--quiet', action='store_true', help='drop firmware log output')
+    parser.add_argument('--wakeup-every', type=float, default=1, help='hours between WAKEUP pin pulses')
+    parser.add_argument('--mode-every', type=float, default=6, help='hours between mode button presses')
+    args = parser.parse_args()
+
+    sim = Simulator()
+    end = int(args.hours * HOUR_MS)
+    from board_driver import Buttons
+    t = args.wakeup_every * HOUR_MS
+    while args.wakeup_every and t < end:
+        sim.wakeup(int(t))
+        t += args.wakeup_every * HOUR_MS
+    t = args.mode_every * HOUR_MS
+    while args.mode_every and t < end:
+        sim.press(int(t), Buttons.RIGHT)
+        t += args.mode_every * HOUR_MS
+
+    stdout = sys.stdout
+    if args.quiet:
+        sys.stdout = io.StringIO()
+    start = time.perf_counter()
+    try:
+        sim.run(end)
+    finally:
+        sys.stdout = stdout
+    wall = time.perf_counter() - start
+    for name, value in sim.report():
+        print('%-16s %s' % (name, value))
+    print('%-16s %.1f s' % ('wall time', wall))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import heapq
+import threading
+import time
+
+
+class StopSimulation(BaseException):
+    pass
+
+
+class RealClock:
+    virtual = False
+
+    def __init__(self):
+        self._t0 = time.monotonic()
+
+    def ticks_us(self):
+        return int((time.monotonic() - self._t0) * 1000000)
+
+    def ticks_ms(self):
+        return self.ticks_us() // 1000
+
+    def sleep_us(self, us):
+        if us > 0:
+            time.sleep(us / 1000000)
+
+    def wall(self):
+        return time.time()
+
+    def add_timer(self, timer):
+        pass
+
+    def remove_timer(self, timer):
+        pass
+
+    def at(self, ms, fn):
+        # fn runs on a timer thread once ticks_ms reaches ms, as an IRQ would.
+        t = threading.Timer(max(ms - self.ticks_ms(), 0) / 1000, fn)
+        t.daemon = True
+        t.start()
+        return t
+
+
+class VirtualClock:
+    virtual = True
+
+    def __init__(self, epoch=None):
+        # epoch is the true wall time (unix seconds) at ticks 0, ntptime hands it to the RTC.
+        self.us = 0
+        self.epoch = time.time() if epoch is None else epoch
+        self.stop_us = None
+        self._queue = []
+        self._seq = 0
+        self._in_irq = False
+        self.fired = 0
+
+    def ticks_us(self):
+        return self.us
+
+    def ticks_ms(self):
+        return self.us // 1000
+
+    def wall(self):
+        return self.epoch + self.us / 1000000
+
+    def stop_at(self, ms):
+        self.stop_us = ms * 1000
+
+    def _push(self, due_us, kind, obj):
+        self._seq += 1
+        heapq.heappush(self._queue, (due_us, self._seq, kind, obj))
+
+    def at(self, ms, fn):
+        self._push(int(ms * 1000), 0, fn)
+
+    def after(self, ms, fn):
+        self._push(self.us + int(ms * 1000), 0, fn)
+
+    def add_timer(self, timer):
+        timer._gen += 1
+        self._push(self.us + timer.period * 1000, timer._gen, timer)
+
+    def remove_timer(self, timer):
+        timer._gen += 1
+
+    def _fire(self, kind, obj):
+        import micropython
+        self._in_irq = True
+        try:
+            if kind == 0:
+                obj()
+            elif kind == obj._gen and obj.callback:
+                if obj.mode == obj.PERIODIC:
+                    self._push(self.us + obj.period * 1000, obj._gen, obj)
+                obj.fire()
+        finally:
+            self._in_irq = False
+        self.fired += 1
+        micropython.run_pending()
+
+    def advance(self, us):
+        end = self.us + max(int(us), 0)
+        if self._in_irq:
+            # Code running in an IRQ does not see other IRQs, time just passes.
+            self.us = end
+            return
+        queue = self._queue
+        while queue and queue[0][0] <= end:
+            due, _, kind, obj = heapq.heappop(queue)
+            if due > self.us:
+                self.us = due
+            self._check_stop()
+            self._fire(kind, obj)
+        self.us = end
+        self._check_stop()
+
+    def sleep_us(self, us):
+        self.advance(us)
+
+    def run_for(self, ms):
+        self.advance(ms * 1000)
+
+    def _check_stop(self):
+        if self.stop_us is not None and self.us >= self.stop_us:
+            raise StopSimulation()
+
+
+_current = None
+
+
+def current():
+    global _current
+    if _current is None:
+        _current = RealClock()
+    return _current
+
+
+def set_current(clock):
+    global _current
+    _current = clock
@@ -1,25 +1,200 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+
+import numpy as np
 from PIL import Image
 
 W = 160
 H = 80
+# Images whose asset is not a full background, by file name without extension.
+SIZES = {'icon_keqin': (80, 80)}
+EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+# Source hashes of the last conversion, kept next to the sources so nothing extra lands on the device.
+MANIFEST = '.image_tools.json'
+
+# Compressed .bimg, read by tft.RLEImage, little endian:
+#   header   MAGIC, kind, reserved, width, height, palette size, longest row   '<4sBBHHHH'
+#   palette  RGB565 entries, 2 bytes each in frame buffer byte order
+#   rows     height + 1 stream offsets '<I', no packet spans two rows
+#   stream   RLE565  c & 0x80: (c & 0x7F) + 1 copies of the next pixel, else c + 1 literal pixels
+#            PAL8    the same with 1-byte palette indexes
+#            PAL4    one byte per run, (length - 1) << 4 | index
+BIMG_MAGIC = b'BIMG'
+BIMG_HEADER = '<4sBBHHHH'
+RLE565 = 0
+PAL8 = 1
+PAL4 = 2
+FORMATS = {'raw': None, 'rle': RLE565, 'pal8': PAL8, 'pal4': PAL4}
+# Palette entries the index of each format can address.
+MAX_COLORS = {PAL8: 256, PAL4: 16}
+
+
+def scan(a):
+    # Pixel (x, H - y - 1) of the resized image at row x, column y: the panel scan order.
+    return a[::-1].transpose(1, 0, *range(2, a.ndim))
+
+
+def rgb565(a):
+    a = a.astype(np.uint16)
+    return ((a[..., 0] & 0xF8) << 8) | ((a[..., 1] & 0xFC) << 3) | ((a[..., 2] & 0xF8) >> 3)
+
+
+def to_rgb565(image, w, h):
+    a = scan(np.asarray(image.convert('RGB').resize((w, h))))
+    return rgb565(a).astype('>u2').tobytes()
+
+
+def packets(row, pixel):
+    out = bytearray()
+    lit = []
+
+    def flush():
+        while lit:
+            chunk = lit[:128]
+            del lit[:128]
+            out.append(len(chunk) - 1)
+            for p in chunk:
+                out.extend(pixel(p))
+
+    i = 0
+    n = len(row)
+    while i < n:
+        j = i
+        while j + 1 < n and row[j + 1] == row[i] and j - i < 127:
+            j += 1
+        if j > i:
+            flush()
+            out.append(0x80 | (j - i))
+            out.extend(pixel(row[i]))
+        else:
+            lit.append(row[i])
+        i = j + 1
+    flush()
+    return out
+
+
+def pal4_runs(row):
+    out = bytearray()
+    i = 0
+    n = len(row)
+    while i < n:
+        j = i
+        while j + 1 < n and row[j + 1] == row[i] and j - i < 15:
+            j += 1
+        out.append(((j - i) << 4) | row[i])
+        i = j + 1
+    return out
+
+
+def encode(kind, rows, palette=b''):
+    if kind == RLE565:
+        streams = [packets(r, lambda v: v.to_bytes(2, 'big')) for r in rows]
+    elif kind == PAL8:
+        streams = [packets(r, lambda v: bytes((v,))) for r in rows]
+    else:
+        streams = [pal4_runs(r) for r in rows]
+    offsets = [0]
+    for st in streams:
+        offsets.append(offsets[-1] + len(st))
+    head = struct.pack(BIMG_HEADER, BIMG_MAGIC, kind, 0, len(rows[0]), len(rows), len(palette) // 2,
+                       max(len(st) for st in streams))
+    return head + palette + struct.pack('<%dI' % len(offsets), *offsets) + b''.join(streams)
+
+
+def encode_raw(raw, w, kind=RLE565):
+    # Lossless RLE of an existing .data file, rows of w pixels.
+    a = np.frombuffer(raw, dtype='>u2').reshape(-1, w)
+    return encode(kind, a.tolist())
+
+
+def to_bimg(image, w, h, kind, colors=None):
+    image = image.convert('RGB').resize((w, h))
+    if kind == RLE565:
+        return encode(kind, rgb565(scan(np.asarray(image))).tolist())
+    # Fewer colours than the format holds leave palette slots free for text on an indexed TFTBuf.
+    q = image.quantize(colors=min(colors or MAX_COLORS[kind], MAX_COLORS[kind]), dither=Image.Dither.NONE)
+    idx = scan(np.asarray(q))
+    n = int(idx.max()) + 1
+    pal = np.array(q.getpalette()[:n * 3], dtype=np.uint16).reshape(n, 3)
+    return encode(kind, idx.tolist(), rgb565(pal).astype('>u2').tobytes())
+
+
+def parse_size(s):
+    w, h = s.lower().split('x')
+    return int(w), int(h)
+
+
+def sizes(args):
+    res = dict(SIZES)
+    res[None] = (W, H)
+    for s in args.size or ():
+        name, _, size = s.rpartition('=')
+        res[name or None] = parse_size(size)
+    return res
 
 
-def as16bit_color(c):
-    return ((c[0] & 0xF8) << 8) | ((c[1] & 0xFC) << 3) | ((c[2] & 0xF8) >> 3)
+def convert_dir(src, out, sizes, force=False, kind=None, colors=None, new=False):
+    os.makedirs(out, exist_ok=True)
+    manifest_path = os.path.join(src, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    done = skipped = 0
+    start = time.perf_counter()
+    for name in sorted(os.listdir(src)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in EXTS:
+            continue
+        w, h = sizes.get(stem, sizes[None])
+        dst = os.path.join(out, stem + ('.data' if kind is None else '.bimg'))
+        # Only images the device already has an asset for, unless asked for new ones.
+        if not new and not os.path.exists(dst) and not os.path.exists(os.path.join(out, stem + '.data')):
+            print('%s: no %s asset in %s, skipped (--new writes it)' % (name, stem, out))
+            continue
+        with open(os.path.join(src, name), 'rb') as f:
+            data = f.read()
+        # Size and format are part of the key, changing either converts again.
+        key = '%s:%dx%d:%s:%s' % (hashlib.sha1(data).hexdigest(), w, h, kind, colors)
+        if manifest.get(name) == key and os.path.exists(dst):
+            skipped += 1
+            continue
+        t = time.perf_counter()
+        with Image.open(os.path.join(src, name)) as image:
+            raw = to_rgb565(image, w, h) if kind is None else to_bimg(image, w, h, kind, colors)
+        with open(dst, 'wb') as f:
+            f.write(raw)
+        manifest[name] = key
+        done += 1
+        print('%s -> %s %dx%d %d B %.1f ms' % (name, dst, w, h, len(raw), (time.perf_counter() - t) * 1000))
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print('%d converted, %d unchanged, %.1f ms' % (done, skipped, (time.perf_counter() - start) * 1000))
 
 
 def main():
-    image = Image.open('./bg_th.jpg')
-    image = image.resize((W, H))
-    res = []
-    for x in range(W):
-        for y in range(H):
-            c = image.getpixel((x, H - y - 1))
-            c = as16bit_color(c)
-            res.append(c.to_bytes(length=2, byteorder='big', signed=False))
-    with open('workSpace/bg_th.data', 'wb') as f:
-        for b in res:
-            f.write(b)
+    parser = argparse.ArgumentParser(description='Convert every image in a directory to RGB565 .data for the TFT.')
+    parser.add_argument('src', nargs='?', default='.')
+    parser.add_argument('-o', '--out', default='workSpace')
+    parser.add_argument('-s', '--size', action='append',
+                        help='[NAME=]WxH, default %dx%d (%s), NAME sets it for one image, repeatable' % (
+                            W, H, ', '.join('%s=%dx%d' % (k, w, h) for k, (w, h) in sorted(SIZES.items()))))
+    parser.add_argument('--format', choices=sorted(FORMATS), default='raw',
+                        help='raw .data, or .bimg run-length encoded RGB565 / 8-bit / 4-bit palette')
+    parser.add_argument('--colors', type=int,
+                        help='palette size, 1-256 for pal8 and 1-16 for pal4, all the format holds by default')
+    parser.add_argument('-f', '--force', action='store_true', help='convert even if the source is unchanged')
+    parser.add_argument('-n', '--new', action='store_true', help='also write images that have no asset in OUT yet')
+    args = parser.parse_args()
+    kind = FORMATS[args.format]
+    if args.colors is not None and not 1 <= args.colors <= MAX_COLORS.get(kind, 0):
+        parser.error('--colors needs --format pal8 (1-256) or pal4 (1-16)')
+    convert_dir(args.src, args.out, sizes(args), args.force, kind, args.colors, args.new)
 
 
 if __name__ == '__main__':
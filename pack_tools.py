@@ -0,0 +1,95 @@
+import argparse
+import os
+import struct
+
+# Same layout as workSpace/assets.py reads.
+MAGIC = b'BPAK'
+VERSION = 1
+HEADER = '<4sBBHI'
+ENTRY = '<BBHHII'
+ALIGN = 16
+
+FMT_RAW = 0
+FMT_RGB565 = 1
+FMT_FONT8X16 = 2
+FMT_PACKED_FONT = 3
+FORMATS = {'.data': FMT_RGB565, '.font': FMT_FONT8X16, '.bfnt': FMT_PACKED_FONT}
+FORMAT_NAMES = {FMT_RAW: 'raw', FMT_RGB565: 'rgb565', FMT_FONT8X16: 'font8x16', FMT_PACKED_FONT: 'packed-font'}
+
+# Frame buffer width, .data images are stored in rows of this many pixels unless given.
+TFT_W = 80
+
+
+def parse_asset(spec):
+    # path[:WxH]
+    path, _, size = spec.partition(':')
+    name = os.path.basename(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    fmt = FORMATS.get(os.path.splitext(name)[1].lower(), FMT_RAW)
+    w = h = 0
+    if size:
+        w, h = (int(v) for v in size.lower().split('x'))
+    elif fmt == FMT_RGB565:
+        w = TFT_W
+        h = len(data) // (TFT_W * 2)
+    if fmt == FMT_RGB565 and w * h * 2 != len(data):
+        raise SystemExit('%s: %d bytes is not %dx%d RGB565' % (path, len(data), w, h))
+    return name, fmt, w, h, data
+
+
+def build(specs, align=ALIGN):
+    assets = [parse_asset(s) for s in specs]
+    index = b''
+    for name, fmt, w, h, data in assets:
+        index += struct.pack(ENTRY, len(name), fmt, w, h, 0, 0) + name.encode()
+    offset = struct.calcsize(HEADER) + len(index)
+    index = b''
+    payload = b''
+    for name, fmt, w, h, data in assets:
+        pad = -(offset + len(payload)) % align
+        payload += b'\0' * pad
+        index += struct.pack(ENTRY, len(name), fmt, w, h, offset + len(payload), len(data)) + name.encode()
+        payload += data
+    head = struct.pack(HEADER, MAGIC, VERSION, align, len(assets), len(index))
+    return head + index + payload
+
+
+def read_index(pack):
+    magic, version, align, count, size = struct.unpack_from(HEADER, pack)
+    if magic != MAGIC:
+        raise SystemExit('not an asset pack')
+    p = struct.calcsize(HEADER)
+    res = []
+    for i in range(count):
+        name_len, fmt, w, h, offset, length = struct.unpack_from(ENTRY, pack, p)
+        p += struct.calcsize(ENTRY)
+        res.append((pack[p:p + name_len].decode(), fmt, w, h, offset, length))
+        p += name_len
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or list the asset pack served by workSpace/assets.py.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help='pack assets, named by their file name')
+    b.add_argument('assets', nargs='+', help='path[:WxH]')
+    b.add_argument('-o', '--out', default='workSpace/assets.pack')
+    b.add_argument('--align', type=int, default=ALIGN)
+    ls = sub.add_parser('list')
+    ls.add_argument('pack', nargs='?', default='workSpace/assets.pack')
+    args = parser.parse_args()
+    if args.cmd == 'build':
+        pack = build(args.assets, args.align)
+        with open(args.out, 'wb') as f:
+            f.write(pack)
+        print('%s: %d assets, %d bytes' % (args.out, len(args.assets), len(pack)))
+        return
+    with open(args.pack, 'rb') as f:
+        pack = f.read()
+    for name, fmt, w, h, offset, length in read_index(pack):
+        print('%-20s %-12s %4dx%-4d @%-7d %d B' % (name, FORMAT_NAMES.get(fmt, fmt), w, h, offset, length))
+
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,7 @@ class TFT(object):
     SLPOUT = 0x11
     PTLON = 0x12
     NORON = 0x13
+    PTLAR = 0x30
 
     INVOFF = 0x20
     INVON = 0x21
@@ -70,6 +71,39 @@ class TFT(object):
     BLACK = 0
     WHITE = TFTColor(0xFF, 0xFF, 0xFF)
 
+    # Bytes of queued commands and data, must hold the longest command.
+    CMD_BUF = 64
+    # Pixels in the pattern fill_rect streams.
+    FILL_PIXELS = 64
+    # Frame memory rows, the scroll areas add up to this.
+    SCROLL_ROWS = 162
+
+    # initr sequence after the hardware reset: (command, data, us to wait after it).
+    # None data is the full screen window, taken from the size.
+    INIT = (
+        (SWRESET, b'', 150),
+        (SLPOUT, b'', 500),  # Out of sleep mode.
+        (FRMCTR1, b'\x01\x2c\x2d', 0),  # Fastest refresh, 6 lines front, 3 lines back.
+        (FRMCTR2, b'\x01\x2c\x2d', 0),
+        (FRMCTR3, b'\x01\x2c\x2d\x01\x2c\x2d', 10),
+        (INVCTR, b'\x07', 0),  # Line inversion.
+        (PWCTR1, b'\xa2\x02\x84', 0),
+        (PWCTR2, b'\xc5', 0),  # VGH = 14.7V, VGL = -7.35V
+        (PWCTR3, b'\x0a\x00', 0),  # Opamp current small, boost frequency.
+        (PWCTR4, b'\x8a\x2a', 0),
+        (PWCTR5, b'\x8a\xee', 0),
+        (VMCTR1, b'\x0e', 0),
+        (INVOFF, b'', 0),
+        (MADCTL, b'\xc8', 0),
+        (COLMOD, b'\x05', 0),  # 16 bit colour.
+        (CASET, None, 0),
+        (RASET, None, 0),
+        (GMCTRP1, b'\x0f\x1a\x0f\x18\x2f\x28\x20\x22\x1f\x1b\x23\x37\x00\x07\x02\x10', 0),
+        (GMCTRN1, b'\x0f\x1b\x0f\x17\x33\x2c\x29\x2e\x30\x30\x39\x3f\x00\x07\x03\x10', 10),
+        (DISPON, b'', 100),
+        (NORON, b'', 10),  # Normal display on.
+    )
+
     @staticmethod
     def color(aR, aG, aB):
         return TFTColor(aR, aG, aB)
@@ -79,6 +113,8 @@ class TFT(object):
         self._offset = bytearray([0, 0])
         self.rotate = 0  # Vertical with top toward pins.
         self._rgb = True  # color order of rgb.
+        # Fixed areas of scroll_area(). 0/0 is the whole frame memory scrolling, the panel's own
+        # default after reset, so scroll_to works before scroll_area is called.
         self.tfa = 0  # top fixed area
         self.bfa = 0  # bottom fixed area
         self.dc = machine.Pin(aDC, machine.Pin.OUT, machine.Pin.PULL_DOWN)
@@ -88,6 +124,24 @@ class TFT(object):
         self.spi = spi
         self.colorData = bytearray(2)
         self.windowLocData = bytearray(4)
+        self.scrollData = bytearray(6)
+        self.scrollAddr = bytearray(2)
+        self._pattern = bytearray(TFT.FILL_PIXELS * 2)
+        self._patmv = memoryview(self._pattern)
+        # Command stream: queued bytes, the start of each run of command or data bytes,
+        # and the DC level of the first run. Runs alternate so DC flips only between them.
+        self._cmds = bytearray(TFT.CMD_BUF)
+        self._cmv = memoryview(self._cmds)
+        self._starts = bytearray(TFT.CMD_BUF)
+        # Last view sent for each run and its range, see _view.
+        self._views = [None] * TFT.CMD_BUF
+        self._va = bytearray(TFT.CMD_BUF)
+        self._vb = bytearray(TFT.CMD_BUF)
+        self._n = 0
+        self._runs = 0
+        self._dc0 = 0
+        self._dc = -1
+        self._held = False
 
     def size(self):
         return self._size
@@ -103,70 +157,182 @@ class TFT(object):
         self._setMADCTL()
 
     def image(self, x0, y0, x1, y1, data):
-        self._setwindowloc((x0, y0), (x1, y1))
-        self._writedata(data)
+        self.window_begin(x0, y0, x1, y1)
+        self.spi.write(data)
+        self.window_end()
+
+    def image_rows(self, x0, y0, x1, y1, data, offset, stride):
+        # One window write fed row by row from a larger buffer, data should be a memoryview.
+        self.window_begin(x0, y0, x1, y1)
+        n = (x1 - x0 + 1) * 2
+        for i in range(y1 - y0 + 1):
+            self.spi.write(data[offset:offset + n])
+            offset += stride
+        self.window_end()
+
+    def fill_rect(self, x0, y0, x1, y1, aColor):
+        # Solid window streamed from a repeated pattern, no frame buffer behind it.
+        self._setColor(aColor)
+        self.window_begin(x0, y0, x1, y1)
+        self._draw((x1 - x0 + 1) * (y1 - y0 + 1))
+        self.window_end()
+
+    def scroll_area(self, tfa, bfa):
+        # Rows between the top and bottom fixed areas move with scroll_to, starting unscrolled.
+        self.tfa = tfa
+        self.bfa = bfa
+        vsa = TFT.SCROLL_ROWS - tfa - bfa
+        d = self.scrollData
+        d[0] = tfa >> 8
+        d[1] = tfa & 0xff
+        d[2] = vsa >> 8
+        d[3] = vsa & 0xff
+        d[4] = bfa >> 8
+        d[5] = bfa & 0xff
+        self.cmd(TFT.VSCRDEF, d)
+        self._vscrolladdr(tfa)
+
+    def scroll_to(self, y):
+        # The first row of the scroll area shows frame memory row tfa + y, wrapping around.
+        self._vscrolladdr(self.tfa + y % (TFT.SCROLL_ROWS - self.tfa - self.bfa))
+
+    def partial_mode(self, y0, y1):
+        # Only rows y0..y1 are driven, the rest of the panel is blank until normal_mode.
+        y0 += self._offset[1]
+        y1 += self._offset[1]
+        d = self.windowLocData
+        d[0] = y0 >> 8
+        d[1] = y0 & 0xff
+        d[2] = y1 >> 8
+        d[3] = y1 & 0xff
+        self.cmd(TFT.PTLAR, d)
+        self.cmd(TFT.PTLON)
+        self.send()
+
+    def normal_mode(self):
+        self._writecommand(TFT.NORON)
+
+    def window_begin(self, x0, y0, x1, y1):
+        # Pixel data for the window follows through window_write until window_end.
+        self._queuewindow(x0, y0, x1, y1)
+        self.send(True)
+        self.dc(1)
+
+    def window_write(self, data):
+        self.spi.write(data)
+
+    def window_end(self):
+        self.cs(1)
+        self._held = False
+
+    def cmd(self, aCommand, aData=None):
+        # Queues a command and its data, sent with the rest of the batch by send().
+        n = self._n
+        if n + 1 + (len(aData) if aData else 0) > TFT.CMD_BUF:
+            self.send(True)
+            n = 0
+        cmds = self._cmds
+        self._run(0)
+        cmds[n] = aCommand
+        n += 1
+        if aData:
+            self._n = n
+            self._run(1)
+            i = 0
+            while i < len(aData):
+                cmds[n] = aData[i]
+                n += 1
+                i += 1
+        self._n = n
+
+    def send(self, hold=False):
+        # Sends the queued commands in one CS frame, hold keeps CS low for what follows.
+        if self._runs:
+            if not self._held:
+                self.cs(0)
+                self._held = True
+            dc = self._dc0
+            starts = self._starts
+            last = self._runs - 1
+            i = 0
+            while i <= last:
+                self.dc(dc)
+                self.spi.write(self._view(i, starts[i], starts[i + 1] if i < last else self._n))
+                dc ^= 1
+                i += 1
+            self._n = 0
+            self._runs = 0
+            self._dc = -1
+        if not hold and self._held:
+            self.cs(1)
+            self._held = False
+
+    def _run(self, dc):
+        if dc != self._dc:
+            if not self._runs:
+                self._dc0 = dc
+            self._starts[self._runs] = self._n
+            self._runs += 1
+            self._dc = dc
+
+    def _view(self, i, a, b):
+        # Run i reuses its last view when the range is the same, so a repeated batch
+        # like a window set is sent without allocating.
+        if self._va[i] != a or self._vb[i] != b:
+            self._views[i] = self._cmv[a:b]
+            self._va[i] = a
+            self._vb[i] = b
+        return self._views[i]
 
     def _vscrolladdr(self, addr):
-        self._writecommand(TFT.VSCSAD)
-        data2 = bytearray([addr >> 8, addr & 0xff])
-        self._writedata(data2)
+        self.scrollAddr[0] = addr >> 8
+        self.scrollAddr[1] = addr & 0xff
+        self.cmd(TFT.VSCSAD, self.scrollAddr)
+        self.send()
 
     def _setColor(self, aColor):
-        self.colorData[0] = aColor >> 8
-        self.colorData[1] = aColor
-        self.buf = bytes(self.colorData) * 32
+        hi = (aColor >> 8) & 0xff
+        lo = aColor & 0xff
+        p = self._pattern
+        if p[0] == hi and p[1] == lo:
+            return
+        for i in range(0, len(p), 2):
+            p[i] = hi
+            p[i + 1] = lo
 
     def _draw(self, aPixels):
-        self.dc(1)
-        self.cs(0)
-        for i in range(aPixels // 32):
-            self.spi.write(self.buf)
-        rest = (int(aPixels) % 32)
-        if rest > 0:
-            buf2 = bytes(self.colorData) * rest
-            self.spi.write(buf2)
-        self.cs(1)
+        # Streams aPixels of the _setColor colour into the open window.
+        while aPixels >= TFT.FILL_PIXELS:
+            self.spi.write(self._pattern)
+            aPixels -= TFT.FILL_PIXELS
+        if aPixels > 0:
+            self.spi.write(self._patmv[:aPixels * 2])
 
     def _setwindowpoint(self, aPos):
-        x = self._offset[0] + int(aPos[0])
-        y = self._offset[1] + int(aPos[1])
-        self._writecommand(TFT.CASET)  # Column address set.
-        self.windowLocData[0] = self._offset[0]
-        self.windowLocData[1] = x
-        self.windowLocData[2] = self._offset[0]
-        self.windowLocData[3] = x
-        self._writedata(self.windowLocData)
-
-        self._writecommand(TFT.RASET)  # Row address set.
-        self.windowLocData[0] = self._offset[1]
-        self.windowLocData[1] = y
-        self.windowLocData[2] = self._offset[1]
-        self.windowLocData[3] = y
-        self._writedata(self.windowLocData)
-        self._writecommand(TFT.RAMWR)  # Write to RAM.
+        self._setwindowloc(aPos, aPos)
 
     def _setwindowloc(self, aPos0, aPos1):
-        self._writecommand(TFT.CASET)  # Column address set.
+        self._queuewindow(aPos0[0], aPos0[1], aPos1[0], aPos1[1])
+        self.send()
+
+    def _queuewindow(self, x0, y0, x1, y1):
         self.windowLocData[0] = self._offset[0]
-        self.windowLocData[1] = self._offset[0] + int(aPos0[0])
+        self.windowLocData[1] = self._offset[0] + int(x0)
         self.windowLocData[2] = self._offset[0]
-        self.windowLocData[3] = self._offset[0] + int(aPos1[0])
-        self._writedata(self.windowLocData)
+        self.windowLocData[3] = self._offset[0] + int(x1)
+        self.cmd(TFT.CASET, self.windowLocData)  # Column address set.
 
-        self._writecommand(TFT.RASET)  # Row address set.
         self.windowLocData[0] = self._offset[1]
-        self.windowLocData[1] = self._offset[1] + int(aPos0[1])
+        self.windowLocData[1] = self._offset[1] + int(y0)
         self.windowLocData[2] = self._offset[1]
-        self.windowLocData[3] = self._offset[1] + int(aPos1[1])
-        self._writedata(self.windowLocData)
+        self.windowLocData[3] = self._offset[1] + int(y1)
+        self.cmd(TFT.RASET, self.windowLocData)  # Row address set.
 
-        self._writecommand(TFT.RAMWR)  # Write to RAM.
+        self.cmd(TFT.RAMWR)  # Write to RAM.
 
     def _writecommand(self, aCommand):
-        self.dc(0)
-        self.cs(0)
-        self.spi.write(bytearray([aCommand]))
-        self.cs(1)
+        self.cmd(aCommand)
+        self.send()
 
     def _writedata(self, aData):
         self.dc(1)
@@ -195,95 +361,13 @@ class TFT(object):
 
     def initr(self):
         self._reset()
-
-        self._writecommand(TFT.SWRESET)  # Software reset.
-        time.sleep_us(150)
-        self._writecommand(TFT.SLPOUT)  # out of sleep mode.
-        time.sleep_us(500)
-
-        data3 = bytearray([0x01, 0x2C, 0x2D])  # fastest refresh, 6 lines front, 3 lines back.
-        self._writecommand(TFT.FRMCTR1)  # Frame rate control.
-        self._writedata(data3)
-
-        self._writecommand(TFT.FRMCTR2)  # Frame rate control.
-        self._writedata(data3)
-
-        data6 = bytearray([0x01, 0x2c, 0x2d, 0x01, 0x2c, 0x2d])
-        self._writecommand(TFT.FRMCTR3)  # Frame rate control.
-        self._writedata(data6)
-        time.sleep_us(10)
-
-        data1 = bytearray(1)
-        self._writecommand(TFT.INVCTR)  # Display inversion control
-        data1[0] = 0x07  # Line inversion.
-        self._writedata(data1)
-
-        self._writecommand(TFT.PWCTR1)  # Power control
-        data3[0] = 0xA2
-        data3[1] = 0x02
-        data3[2] = 0x84
-        self._writedata(data3)
-
-        self._writecommand(TFT.PWCTR2)  # Power control
-        data1[0] = 0xC5  # VGH = 14.7V, VGL = -7.35V
-        self._writedata(data1)
-
-        data2 = bytearray(2)
-        self._writecommand(TFT.PWCTR3)  # Power control
-        data2[0] = 0x0A  # Opamp current small
-        data2[1] = 0x00  # Boost frequency
-        self._writedata(data2)
-
-        self._writecommand(TFT.PWCTR4)  # Power control
-        data2[0] = 0x8A  # Opamp current small
-        data2[1] = 0x2A  # Boost frequency
-        self._writedata(data2)
-
-        self._writecommand(TFT.PWCTR5)  # Power control
-        data2[0] = 0x8A  # Opamp current small
-        data2[1] = 0xEE  # Boost frequency
-        self._writedata(data2)
-
-        self._writecommand(TFT.VMCTR1)  # Power control
-        data1[0] = 0x0E
-        self._writedata(data1)
-
-        self._writecommand(TFT.INVOFF)
-
-        self._writecommand(TFT.MADCTL)  # Power control
-        data1[0] = 0xC8
-        self._writedata(data1)
-
-        self._writecommand(TFT.COLMOD)
-        data1[0] = 0x05
-        self._writedata(data1)
-
-        self._writecommand(TFT.CASET)  # Column address set.
-        self.windowLocData[0] = 0x00
-        self.windowLocData[1] = 0x00
-        self.windowLocData[2] = 0x00
-        self.windowLocData[3] = self._size[0] - 1
-        self._writedata(self.windowLocData)
-
-        self._writecommand(TFT.RASET)  # Row address set.
-        self.windowLocData[3] = self._size[1] - 1
-        self._writedata(self.windowLocData)
-
-        dataGMCTRP = bytearray([0x0f, 0x1a, 0x0f, 0x18, 0x2f, 0x28, 0x20, 0x22, 0x1f,
-                                0x1b, 0x23, 0x37, 0x00, 0x07, 0x02, 0x10])
-        self._writecommand(TFT.GMCTRP1)
-        self._writedata(dataGMCTRP)
-
-        dataGMCTRN = bytearray([0x0f, 0x1b, 0x0f, 0x17, 0x33, 0x2c, 0x29, 0x2e, 0x30,
-                                0x30, 0x39, 0x3f, 0x00, 0x07, 0x03, 0x10])
-        self._writecommand(TFT.GMCTRN1)
-        self._writedata(dataGMCTRN)
-        time.sleep_us(10)
-
-        self._writecommand(TFT.DISPON)
-        time.sleep_us(100)
-
-        self._writecommand(TFT.NORON)  # Normal display on.
-        time.sleep_us(10)
-
-        self.cs(1)
+        for c, data, us in TFT.INIT:
+            if data is None:
+                data = self.windowLocData
+                data[0] = data[1] = data[2] = 0
+                data[3] = self._size[0 if c == TFT.CASET else 1] - 1
+            self.cmd(c, data)
+            if us:
+                self.send()
+                time.sleep_us(us)
+        self.send()
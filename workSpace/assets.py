@@ -0,0 +1,136 @@
+import os
+import struct
+
+from log import Log
+
+log = Log(tag='assets')
+
+# Pack file built by pack_tools.py, little endian:
+#   header  MAGIC, VERSION, alignment, asset count, index size        '<4sBBHI'
+#   index   name length, format, width, height, offset, length, name   '<BBHHII' + name
+#   payloads at offsets aligned to the header alignment
+MAGIC = b'BPAK'
+HEADER = '<4sBBHI'
+ENTRY = '<BBHHII'
+
+FMT_RAW = 0
+FMT_RGB565 = 1
+FMT_FONT8X16 = 2
+FMT_PACKED_FONT = 3
+
+DEFAULT_PACK = 'assets.pack'
+
+
+class AssetFile:
+    # Read-only window on one asset in the pack, used like a file opened 'rb'.
+    def __init__(self, f, offset, length):
+        self.f = f
+        self.offset = offset
+        self.length = length
+        self.pos = 0
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.length
+        self.pos = min(max(pos, 0), self.length)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def readinto(self, mv):
+        n = min(len(mv), self.length - self.pos)
+        if n <= 0:
+            return 0
+        if n < len(mv):
+            mv = memoryview(mv)[:n]
+        # Other views share the pack file, seek every time.
+        self.f.seek(self.offset + self.pos)
+        r = self.f.readinto(mv)
+        self.pos += r
+        return r
+
+    def read(self, n=-1):
+        left = self.length - self.pos
+        if n < 0 or n > left:
+            n = left
+        self.f.seek(self.offset + self.pos)
+        data = self.f.read(n)
+        self.pos += len(data)
+        return data
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class AssetPack:
+    def __init__(self, file):
+        self.file = file
+        f = open(file, 'rb')
+        magic, version, align, count, size = struct.unpack(HEADER, f.read(struct.calcsize(HEADER)))
+        if magic != MAGIC:
+            f.close()
+            raise ValueError('not an asset pack: %s' % file)
+        index = f.read(size)
+        # name -> (format, width, height, offset, length)
+        self.index = {}
+        n = struct.calcsize(ENTRY)
+        p = 0
+        for i in range(count):
+            name_len, fmt, w, h, offset, length = struct.unpack_from(ENTRY, index, p)
+            p += n
+            name = str(index[p:p + name_len], 'utf-8')
+            p += name_len
+            self.index[name] = (fmt, w, h, offset, length)
+        self.f = f
+        log.info('PACK[%s] %d assets' % (file, count))
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def info(self, name):
+        return self.index.get(name)
+
+    def open(self, name):
+        fmt, w, h, offset, length = self.index[name]
+        return AssetFile(self.f, offset, length)
+
+    def close(self):
+        self.f.close()
+
+
+pack = None
+
+
+def use(file=DEFAULT_PACK):
+    # Serve assets from a pack from now on, keeps loose files if it can not be opened.
+    global pack
+    try:
+        pack = AssetPack(file)
+    except (OSError, ValueError) as e:
+        log.info('PACK[%s] not used: %s' % (file, e))
+        pack = None
+    return pack
+
+
+def open_asset(name):
+    if pack is not None and name in pack:
+        return pack.open(name)
+    return open(name, 'rb')
+
+
+def asset_size(name):
+    if pack is not None and name in pack:
+        return pack.index[name][4]
+    try:
+        return os.stat(name)[6]
+    except OSError:
+        return None
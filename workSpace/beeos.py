@@ -1,7 +1,18 @@
 import binascii
 import time
+from array import array
+
+try:
+    import heapq
+except ImportError:
+    import uheapq as heapq
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 import machine
+import micropython
 import network
 
 from log import Log
@@ -18,19 +29,35 @@ class KernelApi:
 
 
 class Process:
+    # Run interval in ms, 0 means every tick (or every pass of SuspendOSKernel),
+    # None means the process only runs when a subscribed context key changes.
+    PERIOD = 0
+    SUBSCRIBE = ()
+
     def setup(self):
         pass
 
     def loop(self, ctx):
         pass
 
+    def delay(self, ctx):
+        return self.PERIOD
+
     def finish(self):
         pass
 
 
+class AsyncProcess(Process):
+    async def run(self, ctx):
+        pass
+
+
 class Context:
     def __init__(self):
         self.vars = {}
+        self.subs = {}
+        self.changed = {}
+        self.owners = {}
 
     def get_var(self, name, def_var=None):
         if name in self.vars:
@@ -38,7 +65,205 @@ class Context:
         return def_var
 
     def set_var(self, name, var):
-        self.vars[name] = var
+        _vars = self.vars
+        if name in _vars and _vars[name] == var:
+            return
+        _vars[name] = var
+        self.notify(name)
+
+    def notify(self, name):
+        subs = self.subs.get(name)
+        if not subs:
+            return
+        for proc in subs:
+            keys = self.changed[proc]
+            # Coalesce writes until the subscriber has taken its changes.
+            if name in keys:
+                continue
+            keys.append(name)
+            self.owners[proc](proc)
+
+    def subscribe(self, proc, names, cb):
+        self.owners[proc] = cb
+        if proc not in self.changed:
+            self.changed[proc] = []
+        for name in names:
+            subs = self.subs.get(name)
+            if subs is None:
+                subs = []
+                self.subs[name] = subs
+            if proc not in subs:
+                subs.append(proc)
+
+    def unsubscribe(self, proc):
+        for name in self.subs:
+            subs = self.subs[name]
+            if proc in subs:
+                subs.remove(proc)
+        self.changed.pop(proc, None)
+        self.owners.pop(proc, None)
+
+    def has_changes(self, proc):
+        return bool(self.changed.get(proc))
+
+    def changes(self, proc):
+        keys = self.changed.get(proc)
+        if not keys:
+            return ()
+        self.changed[proc] = []
+        return keys
+
+    # Slot access, the plain dict context uses the key itself as slot.
+    def slot(self, name):
+        return name
+
+    def get(self, slot, def_var=None):
+        return self.get_var(slot, def_var)
+
+    def put(self, slot, var):
+        self.set_var(slot, var)
+
+
+_UNSET = object()
+
+
+class SlotContext(Context):
+    # Context keys resolved once to list indexes, for the names the kernel writes every tick.
+    # The list grows by append when a name is first registered (slot(), subscribe() or
+    # set_var()), so register at setup, not in the loop. A value is what was last put:
+    # TICKS_MS is set once per pass, and tasks later in the same pass see that tick's value,
+    # not a fresh time.ticks_ms().
+    def __init__(self, names=()):
+        super().__init__()
+        self.slots = {}
+        self.names = []
+        self.values = []
+        for name in names:
+            self.slot(name)
+
+    def slot(self, name):
+        idx = self.slots.get(name)
+        if idx is None:
+            idx = len(self.values)
+            self.slots[name] = idx
+            self.names.append(name)
+            self.values.append(_UNSET)
+        return idx
+
+    def get(self, slot, def_var=None):
+        var = self.values[slot]
+        if var is _UNSET:
+            return def_var
+        return var
+
+    def put(self, slot, var):
+        values = self.values
+        old = values[slot]
+        if old is not _UNSET and old == var:
+            return
+        values[slot] = var
+        if self.subs:
+            self.notify(self.names[slot])
+
+    def subscribe(self, proc, names, cb):
+        for name in names:
+            self.slot(name)
+        super().subscribe(proc, names, cb)
+
+    def get_var(self, name, def_var=None):
+        idx = self.slots.get(name)
+        if idx is None:
+            return def_var
+        var = self.values[idx]
+        if var is _UNSET:
+            return def_var
+        return var
+
+    def set_var(self, name, var):
+        self.put(self.slot(name), var)
+
+
+class TaskStat:
+    # Upper bounds (us) of the histogram buckets, the last bucket takes everything above.
+    BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+    def __init__(self, name):
+        self.name = name
+        self.hist = [0] * (len(TaskStat.BUCKETS) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.hist)):
+            self.hist[i] = 0
+        self.calls = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, us):
+        if self.calls == 0 or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+        self.calls += 1
+        self.total += us
+        i = 0
+        for b in TaskStat.BUCKETS:
+            if us <= b:
+                break
+            i += 1
+        self.hist[i] += 1
+
+
+class Profiler:
+    TICK = '<tick>'
+
+    def __init__(self, period_ms=0):
+        self.period_us = period_ms * 1000
+        self.stats = {}
+        self.tick_stat = TaskStat(Profiler.TICK)
+        self.overruns = 0
+        self.since = time.ticks_ms()
+
+    def register(self, task):
+        if task not in self.stats:
+            self.stats[task] = TaskStat(getattr(task, 'NAME', task.__class__.__name__))
+
+    def record(self, task, start):
+        stat = self.stats.get(task)
+        if stat:
+            stat.record(time.ticks_diff(time.ticks_us(), start))
+
+    def tick(self, start):
+        us = time.ticks_diff(time.ticks_us(), start)
+        self.tick_stat.record(us)
+        if self.period_us and us > self.period_us:
+            self.overruns += 1
+
+    def reset(self):
+        for task in self.stats:
+            self.stats[task].reset()
+        self.tick_stat.reset()
+        self.overruns = 0
+        self.since = time.ticks_ms()
+
+    def snapshot(self, reset=False):
+        secs = max(time.ticks_diff(time.ticks_ms(), self.since), 1) / 1000
+        res = []
+        for stat in [self.tick_stat] + list(self.stats.values()):
+            avg = stat.total / stat.calls if stat.calls else 0
+            res.append((stat.name, stat.calls, stat.calls / secs, stat.min, stat.max, avg, tuple(stat.hist)))
+        snap = {'secs': secs, 'overruns': self.overruns, 'tasks': res}
+        if reset:
+            self.reset()
+        return snap
+
+    def lines(self):
+        snap = self.snapshot()
+        res = ['OVR:%d' % snap['overruns']]
+        for name, calls, rate, mn, mx, avg, hist in snap['tasks']:
+            res.append('%s %.1f/s %d/%d/%dus' % (name, rate, mn, avg, mx))
+        return res
 
 
 class OSKernel:
@@ -46,6 +271,19 @@ class OSKernel:
 
     def __init__(self, ctx):
         self.ctx = ctx
+        self.profiler = None
+
+    def _all_tasks(self):
+        return ()
+
+    def enable_profiler(self, period_ms=0):
+        self.profiler = Profiler(period_ms)
+        for task in self._all_tasks():
+            self.profiler.register(task)
+        return self.profiler
+
+    def disable_profiler(self):
+        self.profiler = None
 
     def set_var(self, name, var):
         self.ctx.set_var(name, var)
@@ -53,6 +291,21 @@ class OSKernel:
     def get_var(self, name, def_var=None):
         return self.ctx.get_var(name, def_var)
 
+    def notify(self, name):
+        self.ctx.notify(name)
+
+    def changes(self, proc):
+        return self.ctx.changes(proc)
+
+    def slot(self, name):
+        return self.ctx.slot(name)
+
+    def get(self, slot, def_var=None):
+        return self.ctx.get(slot, def_var)
+
+    def put(self, slot, var):
+        self.ctx.put(slot, var)
+
     def setup_os(self):
         pass
 
@@ -111,41 +364,162 @@ state_pin = StatePin()
 
 class TimerOSKernel(OSKernel):
     TICKS = 'timer_ticks'
+    # Missed tick policies of the deferred (scheduled) mode.
+    CATCH_UP = 0
+    SKIP = 1
+    RING = 8
 
-    def __init__(self, ctx, timer=0, frq=TIMER_FRQ):
+    def __init__(self, ctx, timer=0, frq=TIMER_FRQ, deferred=False, policy=CATCH_UP):
         super().__init__(ctx)
         self._timer_no = timer
         self.timer = Timer(timer)
         self.frq = frq
-        self._tasks = []
+        self.deferred = deferred
+        self.policy = policy
+        # Tick tokens (ticks_ms of the ISR) written by the timer ISR only, the
+        # indexes run modulo 2 * RING so a full ring can be told from an empty one.
+        self._ring = array('i', [0] * TimerOSKernel.RING)
+        self._head = 0
+        self._tail = 0
+        self._scheduled = False
+        self._isr_ref = self._isr
+        self._dispatch_ref = self._dispatch
+        self.dropped = 0
+        self._dropped_seen = 0
+        self.missed = 0
+        self.latency_max = 0
+        # Min-heap of (deadline, seq, task), deadline counted in timer ticks.
+        # Entries whose deadline no longer matches _due[task] are stale and skipped.
+        self._heap = []
+        self._due = {}
+        self._ready = []
+        self._seq = 0
+        self._clock = 0
         self.ticks = 0
+        self._s_ticks_ms = ctx.slot(OSKernel.TICKS_MS)
+        self._s_ticks = ctx.slot(TimerOSKernel.TICKS)
 
     def setup_os(self):
         pass
 
-    def _loop(self):
-        state_pin.blink()
-        for task in self._tasks:
-            cmplt = False
+    def _push(self, task, deadline):
+        self._due[task] = deadline
+        if deadline is None:
+            return
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, task))
+
+    def _wake(self, task):
+        if task not in self._ready:
+            self._ready.append(task)
+
+    def _schedule(self, task, now):
+        delay = task.delay(self)
+        if delay is None:
+            deadline = None
+        elif delay <= self.frq:
+            deadline = now + 1
+        else:
+            deadline = now + delay // self.frq
+        if deadline != self._due.get(task):
+            self._push(task, deadline)
+
+    def _all_tasks(self):
+        return self._due.keys()
+
+    def enable_profiler(self, period_ms=None):
+        return super().enable_profiler(self.frq if period_ms is None else period_ms)
+
+    def _run(self, task, now):
+        cmplt = False
+        prof = self.profiler
+        if prof:
+            start = time.ticks_us()
+        try:
+            cmplt = task.loop(self)
+        except Exception as e:
+            log.warn('Error on run task[%s]' % task, e)
+        if prof:
+            prof.record(task, start)
+        if cmplt:
+            log.debug('Task[%s] complete!' % task)
+            del self._due[task]
+            self.ctx.unsubscribe(task)
             try:
-                ticks = time.ticks_ms()
-                self.set_var(OSKernel.TICKS_MS, ticks)
-                self.set_var(TimerOSKernel.TICKS, self.ticks)
-                cmplt = task.loop(self)
+                task.finish()
             except Exception as e:
-                log.warn('Error on run task[%s]' % task, e)
-            if cmplt:
-                log.debug('Task[%s] complete!' % task)
-                self._tasks.remove(task)
-                try:
-                    task.finish()
-                except Exception as e:
-                    log.error('Task[%s] error on finish!' % task, e)
+                log.error('Task[%s] error on finish!' % task, e)
+        else:
+            self._schedule(task, now)
+
+    def _loop(self):
+        prof = self.profiler
+        if prof:
+            start = time.ticks_us()
+        state_pin.blink()
+        ctx = self.ctx
+        ctx.put(self._s_ticks_ms, time.ticks_ms())
+        ctx.put(self._s_ticks, self.ticks)
+        now = self._clock
+        ready = self._ready
+        while ready:
+            task = ready.pop(0)
+            if task in self._due:
+                self._run(task, now)
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, task = heapq.heappop(heap)
+            if self._due.get(task) == deadline:
+                self._run(task, now)
+        self._clock += 1
         self.ticks += 1
         self.ticks %= 0x7FFFFFFF
+        if prof:
+            prof.tick(start)
+
+    def _isr(self, t):
+        size = TimerOSKernel.RING
+        head = self._head
+        if (head - self._tail) % (2 * size) == size:
+            self.dropped += 1
+        else:
+            self._ring[head % size] = time.ticks_ms() & 0x3FFFFFFF
+            self._head = (head + 1) % (2 * size)
+        if not self._scheduled:
+            try:
+                micropython.schedule(self._dispatch_ref, 0)
+                self._scheduled = True
+            except RuntimeError:
+                pass
+
+    def _dispatch(self, _):
+        self._scheduled = False
+        size = TimerOSKernel.RING
+        tail = self._tail
+        tokens = (self._head - tail) % (2 * size)
+        if not tokens:
+            return
+        late = time.ticks_diff(time.ticks_ms() & 0x3FFFFFFF, self._ring[tail % size])
+        if late > self.latency_max:
+            self.latency_max = late
+        self._tail = (tail + tokens) % (2 * size)
+        dropped = self.dropped
+        missed = tokens - 1 + dropped - self._dropped_seen
+        self._dropped_seen = dropped
+        self.missed += missed
+        if self.policy == TimerOSKernel.CATCH_UP:
+            for i in range(missed):
+                self._loop()
+        else:
+            self._clock += missed
+            self.ticks = (self.ticks + missed) % 0x7FFFFFFF
+        self._loop()
 
     def run_forever(self):
-        self.timer.init(mode=Timer.PERIODIC, period=self.frq, callback=lambda t: self._loop())
+        if self.deferred:
+            self.timer.init(mode=Timer.PERIODIC, period=self.frq, callback=self._isr_ref)
+        else:
+            self.timer.init(mode=Timer.PERIODIC, period=self.frq, callback=lambda t: self._loop())
 
     def shutdown(self):
         self.timer.deinit()
@@ -158,42 +532,264 @@ class TimerOSKernel(OSKernel):
         except Exception as e:
             log.error('Error on proc setup', e)
         else:
-            self._tasks.append(proc)
+            self.ctx.subscribe(proc, proc.SUBSCRIBE, self._wake)
+            if self.profiler:
+                self.profiler.register(proc)
+            self._push(proc, self._clock)
+
+
+class IdleHook:
+    def idle(self, kernel, ms):
+        pass
+
+
+class SleepIdle(IdleHook):
+    SLICE = 20
+
+    def idle(self, kernel, ms):
+        end = time.ticks_add(time.ticks_ms(), ms)
+        while not kernel.pending:
+            left = time.ticks_diff(end, time.ticks_ms())
+            if left <= 0:
+                return
+            time.sleep_ms(min(left, SleepIdle.SLICE))
+
+
+class LightSleepIdle(IdleHook):
+    # Only usable when no machine.Timer has to keep running, wake sources are up to the board.
+    def idle(self, kernel, ms):
+        if not kernel.pending:
+            machine.lightsleep(ms)
 
 
 class SuspendOSKernel(OSKernel):
-    def __init__(self, ctx):
+    IDLE_MAX = 1000
+
+    def __init__(self, ctx, idle_hook=None):
         super().__init__(ctx)
         self.tasks = []
+        self.deadlines = []
         self.running = False
+        self.pending = False
+        self.idle_hook = idle_hook or SleepIdle()
+        # Context keys of wake_on pins, set by the IRQ and notified by the next pass.
+        self.irq_keys = {}
+
+    def _wake(self, task):
+        self.pending = True
+
+    def wakeup(self):
+        self.pending = True
+
+    def wake_on(self, pin, trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, name=None):
+        # An edge ends the idle wait, with a name the tasks subscribed to it run on that pass.
+        if name is not None:
+            self.irq_keys[name] = False
+        pin.irq(lambda p: self._irq(name), trigger=trigger)
+
+    def _irq(self, name):
+        if name is not None:
+            self.irq_keys[name] = True
+        self.pending = True
 
     def setup_os(self):
         self.running = True
 
+    def _all_tasks(self):
+        return self.tasks
+
+    def _run_pass(self):
+        prof = self.profiler
+        if prof:
+            pass_start = time.ticks_us()
+        irq = self.irq_keys
+        for name in irq:
+            if irq[name]:
+                irq[name] = False
+                self.notify(name)
+        self.pending = False
+        now = time.ticks_ms()
+        self.set_var(OSKernel.TICKS_MS, now)
+        ctx = self.ctx
+        wait = SuspendOSKernel.IDLE_MAX
+        for i in range(len(self.tasks)):
+            task = self.tasks[i]
+            deadline = self.deadlines[i]
+            if deadline is None:
+                left = None
+            else:
+                left = time.ticks_diff(deadline, now)
+            if ctx.has_changes(task) or (left is not None and left <= 0):
+                if prof:
+                    start = time.ticks_us()
+                try:
+                    task.loop(self)
+                    left = task.delay(self)
+                except Exception as e:
+                    log.error('Error on loop: %s' % task, e)
+                    left = task.PERIOD
+                if prof:
+                    prof.record(task, start)
+                if left is None:
+                    self.deadlines[i] = None
+                else:
+                    self.deadlines[i] = time.ticks_add(now, left)
+            if left is not None and left < wait:
+                wait = left
+        if prof:
+            prof.tick(pass_start)
+        return wait
+
     def run_forever(self):
-        task_index = 0
         while self.running:
-            task_len = len(self.tasks)
-            if not task_len:
-                continue
-            task = self.tasks[task_index]
-            ticks = time.ticks_ms()
-            self.set_var(OSKernel.TICKS_MS, ticks)
-            try:
-                task.loop(self)
-            except Exception as e:
-                log.error('Error on loop: %s' % task, e)
-            task_index += 1
-            task_index %= task_len
+            wait = self._run_pass()
+            if wait > 0 and not self.pending:
+                self.idle_hook.idle(self, wait)
 
     def exec(self, proc):
         self.tasks.append(proc)
+        self.deadlines.append(time.ticks_ms())
+        self.ctx.subscribe(proc, proc.SUBSCRIBE, self._wake)
+        if self.profiler:
+            self.profiler.register(proc)
         proc.setup()
         if hasattr(proc, 'NAME'):
             self.set_var(proc.NAME, proc)
 
     def shutdown(self):
         self.running = False
+        self.wakeup()
+
+
+class PinEvent:
+    def __init__(self, pin, trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING):
+        if hasattr(asyncio, 'ThreadSafeFlag'):
+            self._flag = asyncio.ThreadSafeFlag()
+        else:
+            self._flag = asyncio.Event()
+        self.pin = pin
+        pin.irq(lambda p: self._flag.set(), trigger=trigger)
+
+    async def wait(self):
+        await self._flag.wait()
+        if hasattr(self._flag, 'clear'):
+            self._flag.clear()
+        return self.pin.value()
+
+
+class AsyncOSKernel(OSKernel):
+    def __init__(self, ctx, frq=TIMER_FRQ):
+        super().__init__(ctx)
+        self.frq = frq
+        self.ticks = 0
+        self.running = False
+        self._procs = []
+        self._events = {}
+        self._stop = None
+
+    def setup_os(self):
+        self.running = True
+
+    @staticmethod
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+    async def _ticker(self):
+        while self.running:
+            state_pin.blink()
+            self.set_var(TimerOSKernel.TICKS, self.ticks)
+            self.ticks += 1
+            self.ticks %= 0x7FFFFFFF
+            await self.sleep_ms(self.frq)
+
+    def _wake(self, proc):
+        ev = self._events.get(proc)
+        if ev:
+            ev.set()
+
+    async def _idle(self, proc, delay):
+        ev = self._events[proc]
+        if self.ctx.has_changes(proc):
+            await asyncio.sleep(0)
+        elif delay is None:
+            await ev.wait()
+        else:
+            try:
+                await asyncio.wait_for(ev.wait(), max(delay, self.frq) / 1000)
+            except asyncio.TimeoutError:
+                pass
+        ev.clear()
+
+    async def wait_changes(self, proc):
+        ev = self._events[proc]
+        while not self.ctx.has_changes(proc):
+            await ev.wait()
+            ev.clear()
+        return self.ctx.changes(proc)
+
+    async def _adapt(self, proc):
+        while self.running:
+            cmplt = False
+            try:
+                self.set_var(OSKernel.TICKS_MS, time.ticks_ms())
+                cmplt = proc.loop(self)
+            except Exception as e:
+                log.warn('Error on run task[%s]' % proc, e)
+            if cmplt:
+                log.debug('Task[%s] complete!' % proc)
+                try:
+                    proc.finish()
+                except Exception as e:
+                    log.error('Task[%s] error on finish!' % proc, e)
+                break
+            await self._idle(proc, proc.delay(self))
+        self.ctx.unsubscribe(proc)
+
+    async def _run(self, proc):
+        try:
+            await proc.run(self)
+        except Exception as e:
+            log.error('Error on run task[%s]' % proc, e)
+        self.ctx.unsubscribe(proc)
+        try:
+            proc.finish()
+        except Exception as e:
+            log.error('Task[%s] error on finish!' % proc, e)
+
+    def _start(self, proc):
+        if isinstance(proc, AsyncProcess):
+            asyncio.create_task(self._run(proc))
+        else:
+            asyncio.create_task(self._adapt(proc))
+
+    async def _main(self):
+        self._stop = asyncio.Event()
+        asyncio.create_task(self._ticker())
+        for proc in self._procs:
+            self._start(proc)
+        await self._stop.wait()
+
+    def run_forever(self):
+        asyncio.run(self._main())
+
+    def exec(self, proc):
+        try:
+            proc.setup()
+            if hasattr(proc, 'NAME'):
+                self.set_var(proc.NAME, proc)
+        except Exception as e:
+            log.error('Error on proc setup', e)
+            return
+        self._events[proc] = asyncio.Event()
+        self.ctx.subscribe(proc, proc.SUBSCRIBE, self._wake)
+        self._procs.append(proc)
+        if self._stop:
+            self._start(proc)
+
+    def shutdown(self):
+        self.running = False
+        if self._stop:
+            self._stop.set()
 
 
 class WifiConnectProcess(Process):
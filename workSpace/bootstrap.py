@@ -4,8 +4,9 @@ import network
 import ntptime
 from dht import DHT11
 
-from beeos import TimerOSKernel, SuspendOSKernel, Process, OSKernel, Context, state_pin
-from board_driver import TH_SENSOR, Buttons
+import assets
+from beeos import TimerOSKernel, SuspendOSKernel, Process, OSKernel, SlotContext, state_pin
+from board_driver import TH_SENSOR, WAKEUP, Buttons
 from led_display import DEFAULT_COLOR_RULE, FixedColorRule
 from log import Log
 from rtc import RTCHelper
@@ -16,6 +17,7 @@ MODE = 'mode'
 MODE_TIME = 0
 MODE_TH = 1
 MODE_LIST = (MODE_TIME, MODE_TH)
+PROFILE = False
 
 
 class LEDCTLTask(Process):
@@ -23,9 +25,9 @@ class LEDCTLTask(Process):
     STR_1 = 'display_str_1'
     STR_2 = 'display_str_2'
     SEG_VISIBLE = 'display_seg_visible'
-    FLUSH = 'display_flush'
     COLOR_RULE = 'display_color_rule'
-    FORCE_FLUSH = 'display_force_flush'
+    PERIOD = None
+    SUBSCRIBE = (STR_1, STR_2, SEG_VISIBLE, COLOR_RULE)
 
     def __init__(self):
         self.str1 = ''
@@ -44,15 +46,14 @@ class LEDCTLTask(Process):
 
     def loop(self, ctx):
         _s = LEDCTLTask
-        flush = ctx.get_var(_s.FLUSH, False)
-        if not flush:
+        changed = ctx.changes(self)
+        if not changed:
             return
-        ctx.set_var(_s.FLUSH, False)
         str1 = ctx.get_var(_s.STR_1)
         str2 = ctx.get_var(_s.STR_2)
         seg_visible = ctx.get_var(_s.SEG_VISIBLE)
         self.color_rule = ctx.get_var(_s.COLOR_RULE, DEFAULT_COLOR_RULE)
-        force = ctx.get_var(_s.FORCE_FLUSH, False)
+        force = _s.COLOR_RULE in changed
 
         self.target1.set_color_rule(self.color_rule)
         self.target2.set_color_rule(self.color_rule)
@@ -74,21 +75,27 @@ class LEDCTLTask(Process):
 
 class THSensorTask(Process):
     NAME = "th_task"
-    FLUSH = 'th_flush'
+    PERIOD = 10000
+    SUBSCRIBE = (MODE,)
 
     def __init__(self):
         self.dht = DHT11(TH_SENSOR)
         self.last_mes = 0
+        # Context slots of MODE and TICKS_MS, resolved on the first loop.
+        self.s_mode = None
+        self.s_now = None
 
     def loop(self, ctx):
-        mode = ctx.get_var(MODE)
+        if self.s_mode is None:
+            self.s_mode = ctx.slot(MODE)
+            self.s_now = ctx.slot(OSKernel.TICKS_MS)
+        changed = ctx.changes(self)
+        mode = ctx.get(self.s_mode)
         if mode != MODE_TH:
             return
-        now = ctx.get_var(OSKernel.TICKS_MS, 0)
-        flush = ctx.get_var(THSensorTask.FLUSH, False)
-        if now - self.last_mes < 10000 and (not flush):
+        now = ctx.get(self.s_now, 0)
+        if now - self.last_mes < 10000 and (not changed):
             return
-        ctx.set_var(THSensorTask.FLUSH, False)
         self.last_mes = now
         self.dht.measure()
         temp = str(self.dht.temperature())
@@ -96,7 +103,6 @@ class THSensorTask(Process):
         ctx.set_var(LEDCTLTask.STR_1, temp)
         ctx.set_var(LEDCTLTask.STR_2, hum)
         ctx.set_var(LEDCTLTask.SEG_VISIBLE, False)
-        ctx.set_var(LEDCTLTask.FLUSH, True)
         log.debug('TH:[%s/%s]' % (temp, hum))
 
 
@@ -108,7 +114,8 @@ BEEP_SEQ_C = ((2900, 1),)
 class BeepTask(Process):
     NAME = 'beep_task'
     SEQ = 'beep_seq'
-    FLUSH = 'beep_flush'
+    PERIOD = None
+    SUBSCRIBE = (SEQ,)
 
     def __init__(self):
         self.seq = ()
@@ -116,17 +123,30 @@ class BeepTask(Process):
         from board_driver import Beep
         self.beep = Beep.get()
         self.next = 0
+        # Context slot of TICKS, resolved on the first loop.
+        self.s_ticks = None
+
+    @staticmethod
+    def play(ctx, seq):
+        ctx.set_var(BeepTask.SEQ, seq)
+        ctx.notify(BeepTask.SEQ)
+
+    def delay(self, ctx):
+        if self.seq:
+            return 0
+        return None
 
     def loop(self, ctx):
-        ticks = ctx.get_var(TimerOSKernel.TICKS, 0)
-        flush = ctx.get_var(BeepTask.FLUSH, False)
-        if flush:
+        if self.s_ticks is None:
+            self.s_ticks = ctx.slot(TimerOSKernel.TICKS)
+        ticks = ctx.get(self.s_ticks, 0)
+        if ctx.changes(self):
             self.seq = ctx.get_var(BeepTask.SEQ, BEEP_SEQ_A)
             self.seq_index = 0
             self.next = ticks
-            ctx.set_var(BeepTask.FLUSH, False)
         if self.seq_index >= len(self.seq):
             self.beep.disable()
+            self.seq = ()
             return
         self.beep.enable()
         if ticks >= self.next:
@@ -138,13 +158,21 @@ class BeepTask(Process):
 
 class TimeTask(Process):
     SHOW_DATE = 'time_show_date'
+    PERIOD = 500
+    SUBSCRIBE = (MODE, SHOW_DATE)
 
     def __init__(self):
         self.last_date_act = -1
+        # Context slots of MODE and TICKS_MS, resolved on the first loop.
+        self.s_mode = None
+        self.s_now = None
 
     def loop(self, ctx):
-        mode = ctx.get_var(MODE)
-        ticks = ctx.get_var(TimerOSKernel.TICKS, 0)
+        if self.s_mode is None:
+            self.s_mode = ctx.slot(MODE)
+            self.s_now = ctx.slot(OSKernel.TICKS_MS)
+        changed = ctx.changes(self)
+        mode = ctx.get(self.s_mode)
         if mode != MODE_TIME:
             return
         tt = RTCHelper.current_time_tuple6()
@@ -153,24 +181,19 @@ class TimeTask(Process):
         lm = ctx.get_var(LEDCTLTask.STR_1, '')
         ctx.set_var(LEDCTLTask.STR_1, m)
         ctx.set_var(LEDCTLTask.STR_2, h)
+        ctx.set_var(TFTTask.CLOCK, '%02d:%02d' % (tt[3], tt[4]))
         if lm != m:
-            ctx.set_var(BeepTask.FLUSH, True)
-            ctx.set_var(BeepTask.SEQ, BEEP_SEQ_C)
-        ctx.set_var(LEDCTLTask.FLUSH, True)
+            BeepTask.play(ctx, BEEP_SEQ_C)
         seg_visible = ctx.get_var(LEDCTLTask.SEG_VISIBLE, False)
-        if ticks % 5 == 0:
-            ctx.set_var(LEDCTLTask.SEG_VISIBLE, not seg_visible)
-        self.show_date(ctx, tt)
+        ctx.set_var(LEDCTLTask.SEG_VISIBLE, not seg_visible)
+        self.show_date(ctx, tt, TimeTask.SHOW_DATE in changed)
 
-    def show_date(self, ctx, tt):
-        now = ctx.get_var(OSKernel.TICKS_MS, 0)
-        show_date = ctx.get_var(TimeTask.SHOW_DATE, False)
+    def show_date(self, ctx, tt, show_date):
+        now = ctx.get(self.s_now, 0)
         if now - self.last_date_act > 60 * 1000 or self.last_date_act <= 0 or show_date:
             self.last_date_act = now
             date = '%s-%s-%s' % (tt[0], tt[1], tt[2])
             ctx.set_var(TFTTask.TEXT_3, date)
-            ctx.set_var(TFTTask.FLUSH, True)
-            ctx.set_var(TimeTask.SHOW_DATE, False)
 
 
 INACTIVE_RULE = DEFAULT_COLOR_RULE
@@ -179,6 +202,11 @@ ACTIVE_RULE.set_color((3, 1, 1), (3, 1, 1), (3, 1, 1))
 
 
 class WakeupTask(Process):
+    PERIOD = 1000
+    # Notified by SuspendOSKernel.wake_on on every WAKEUP edge, PERIOD stays as a fallback poll.
+    EDGE = 'wakeup_edge'
+    SUBSCRIBE = (EDGE,)
+
     def __init__(self):
         self.pin = None
         self.last_value = 0
@@ -188,6 +216,8 @@ class WakeupTask(Process):
         self.pin = WAKEUP
 
     def loop(self, ctx):
+        # Consume the edge, the pin level below is what counts.
+        ctx.changes(self)
         value = self.pin.value()
         if value == self.last_value:
             return
@@ -195,34 +225,26 @@ class WakeupTask(Process):
         log.debug('Wakeup:[%s]' % value)
         if value:
             rule = ACTIVE_RULE
-            ctx.set_var(TFTTask.ENABLE, True)
-            ctx.set_var(TFTTask.FLUSH, True)
+            ctx.notify(TFTTask.ENABLE)
         else:
             rule = INACTIVE_RULE
         ctx.set_var(LEDCTLTask.COLOR_RULE, rule)
-        ctx.set_var(LEDCTLTask.FLUSH, True)
-        ctx.set_var(LEDCTLTask.FORCE_FLUSH, True)
 
 
 class MEMTask(Process):
-    def __init__(self):
-        self.next = 0
+    PERIOD = 10000
 
     def loop(self, ctx):
-        now = ctx.get_var(OSKernel.TICKS_MS, 0)
-        if self.next > now:
-            return
-        self.next = now + 10000
         free = gc.mem_free()
         alloc = gc.mem_alloc()
         total = free + alloc
         rate = alloc / total * 100
         ctx.set_var(TFTTask.TEXT_2, 'MEM:%.1f%%' % rate)
-        ctx.set_var(TFTTask.FLUSH, True)
 
 
 class NetworkTask(Process):
     NAME = 'network_task'
+    PERIOD = 1000
 
     def __init__(self, ssid, passwd):
         self.ssid = ssid
@@ -266,24 +288,37 @@ class NetworkTask(Process):
             try:
                 ntptime.settime()
                 self.time_last_sync = now
-                ctx.set_var(TFTTask.FLUSH, True)
-                ctx.set_var(TimeTask.SHOW_DATE, True)
+                ctx.notify(TimeTask.SHOW_DATE)
             except Exception as e:
                 log.error('Err SYNC_TIME', e)
 
 
+class ProfileTask(Process):
+    PERIOD = 60000
+
+    def __init__(self, kernels):
+        self.kernels = kernels
+
+    def loop(self, ctx):
+        for kernel in self.kernels:
+            for line in kernel.profiler.lines():
+                log.info('PROF:%s' % line)
+
+
 class Entry:
     def __init__(self):
-        self.ctx = Context()
+        # Backgrounds and fonts come from assets.pack when it is deployed, loose files otherwise.
+        assets.use()
+        self.ctx = SlotContext((OSKernel.TICKS_MS, TimerOSKernel.TICKS, MODE))
         self.skernel = SuspendOSKernel(self.ctx)
-        self.tkernel = TimerOSKernel(self.ctx, frq=100)
+        self.tkernel = TimerOSKernel(self.ctx, frq=100, deferred=True)
 
         self.skernel.exec(THSensorTask())
         self.skernel.exec(WakeupTask())
         self.skernel.exec(TFTTask())
+        self.skernel.wake_on(WAKEUP, name=WakeupTask.EDGE)
 
-        self.ctx.set_var(TFTTask.FLUSH, True)
-        self.ctx.set_var(TFTTask.ENABLE, True)
+        self.ctx.notify(TFTTask.ENABLE)
         self.ctx.set_var(TFTTask.TEXT_1, 'Clock')
         self.tkernel.exec(TimeTask())
         self.tkernel.exec(BeepTask())
@@ -291,6 +326,10 @@ class Entry:
         self.tkernel.exec(LEDCTLTask())
         self.network_task = NetworkTask('Panshi_AP', 'qwerasdzx!')
         self.tkernel.exec(self.network_task)
+        if PROFILE:
+            self.skernel.enable_profiler()
+            self.tkernel.enable_profiler()
+            self.tkernel.exec(ProfileTask((self.tkernel, self.skernel)))
         self.btns = Buttons.get()
 
     def start(self):
@@ -306,8 +345,7 @@ class Entry:
         self.btns.listen(lambda b, v: self.on_btn(b, v))
 
     def beep(self, seq):
-        self.ctx.set_var(BeepTask.SEQ, seq)
-        self.ctx.set_var(BeepTask.FLUSH, True)
+        BeepTask.play(self.ctx, seq)
 
     def on_btn(self, b, v):
         log.debug('BTN:%s/%s' % (b, v))
@@ -327,6 +365,4 @@ class Entry:
             else:
                 self.ctx.set_var(TFTTask.BC, TFTTask.BC_CLOCK)
                 self.ctx.set_var(TFTTask.TEXT_1, "Clock")
-            self.ctx.set_var(TFTTask.FLUSH, True)
-            self.ctx.set_var(THSensorTask.FLUSH, True)
             log.debug('SET_MODE:%s' % mode)
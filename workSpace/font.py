@@ -1,47 +1,254 @@
+import struct
 from io import BytesIO
 
+import framebuf
+
+from assets import open_asset
+
 
 class ASCIIFont:
     WIDTH = 8
     HEIGHT = 16
+    # Bytes per glyph, one per row.
+    SIZE = 16
+    # Bytes of one rendered glyph image, RGB565.
+    CHAR_BYTES = WIDTH * HEIGHT * 2
+    CODES = """ !"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~"""
+    # Glyphs kept in RAM in lazy mode.
+    CACHE = 16
 
-    def __init__(self, file):
+    def __init__(self, file, codes=CODES, lazy=False, cache=CACHE):
         self.file = file
-        self.codes = """ !"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\]^_`abcdefghijklmnopqrstuvwxyz{|}~"""
-        with open('ascii.font', 'rb') as f:
-            self.font_bytes = f.read()
+        self.codes = codes
+        # Unknown characters draw as the last glyph.
+        self.fallback = len(codes) - 1
+        self.first = ord(codes[0])
+        # Contiguous code sets index by ord() offset, others through a table.
+        self.index = None
+        for i in range(len(codes)):
+            if ord(codes[i]) != self.first + i:
+                self.index = {}
+                for j in range(len(codes)):
+                    self.index[ord(codes[j])] = j
+                break
+        self.lazy = lazy
+        self.size = cache
+        self.hits = 0
+        self.misses = 0
+        if lazy:
+            self.font_bytes = None
+            self.f = open_asset(file)
+            # Least recently used first.
+            self.keys = []
+            self.glyphs = {}
+        else:
+            with open_asset(file) as f:
+                self.font_bytes = f.read()
 
     def _find_idx(self, c):
-        for i in range(len(self.codes)):
-            cc = self.codes[i]
-            if cc == c:
-                return i
-            if cc > c:
-                return len(self.codes) - 1
-        return len(self.codes) - 1
+        o = ord(c)
+        if self.index is not None:
+            return self.index.get(o, self.fallback)
+        i = o - self.first
+        if 0 <= i <= self.fallback:
+            return i
+        return self.fallback
 
     def find_font(self, c):
         idx = self._find_idx(c)
-        return self.font_bytes[idx * 16: idx * 16 + 16]
+        if not self.lazy:
+            n = ASCIIFont.SIZE
+            return self.font_bytes[idx * n: idx * n + n]
+        g = self.glyphs.get(idx)
+        if g is not None:
+            self.hits += 1
+            if self.keys[-1] != idx:
+                self.keys.remove(idx)
+                self.keys.append(idx)
+            return g
+        self.misses += 1
+        if len(self.keys) >= self.size:
+            del self.glyphs[self.keys.pop(0)]
+        self.f.seek(idx * ASCIIFont.SIZE)
+        g = self.f.read(ASCIIFont.SIZE)
+        self.keys.append(idx)
+        self.glyphs[idx] = g
+        return g
+
+    def close(self):
+        if self.lazy:
+            self.f.close()
+
+    def char_into(self, c, buf, offset, bc, fc):
+        # Glyph rotated to 16x8 pixels of 2-byte colours, written into buf at offset.
+        # Nothing is allocated, returns the span length.
+        n = ASCIIFont.SIZE
+        if self.lazy:
+            font = self.find_font(c)
+            last = n - 1
+        else:
+            font = self.font_bytes
+            last = self._find_idx(c) * n + n - 1
+        f0 = fc[0]
+        f1 = fc[1]
+        b0 = bc[0]
+        b1 = bc[1]
+        o = offset
+        for i in range(8):
+            m = 0x80 >> i
+            for ri in range(n):
+                if font[last - ri] & m:
+                    buf[o] = f0
+                    buf[o + 1] = f1
+                else:
+                    buf[o] = b0
+                    buf[o + 1] = b1
+                o += 2
+        return o - offset
+
+    def str_into(self, s, buf, offset, bc, fc):
+        # buf needs len(s) * CHAR_BYTES bytes from offset, the result is one image 16 pixels wide.
+        o = offset
+        for c in s:
+            o += self.char_into(c, buf, o, bc, fc)
+        return o - offset
 
     def char_img(self, c, bc, fc, out):
-        font = self.find_font(c)
         if not out:
             out = BytesIO()
-        lines = len(font)
-        for i in range(8):
-            for ri in range(lines):
-                r = font[lines - ri - 1]
-                if r & (0x80 >> i):
-                    c = fc
-                else:
-                    c = bc
-                for ci in c:
-                    out.write(ci.to_bytes(1, 'big'))
+        img = bytearray(ASCIIFont.CHAR_BYTES)
+        self.char_into(c, img, 0, bc, fc)
+        out.write(img)
         return out
 
     def str_img(self, s, bc, fc):
         res = BytesIO()
+        img = bytearray(ASCIIFont.CHAR_BYTES)
         for c in s:
-            self.char_img(c, bc, fc, res)
+            self.char_into(c, img, 0, bc, fc)
+            res.write(img)
         return res
+
+
+class PackedFont:
+    # Fonts compiled by font_tools.py, glyphs are MONO_HLSB and already rotated for TFTBuf.
+    MAGIC = b'BFNT'
+    HEADER = '<4sBBH'
+    FACE = '<BBHI'
+    ENTRY = '<HBBI'
+    # Glyph frame buffers kept in RAM in lazy mode.
+    CACHE = 16
+
+    def __init__(self, file, height=None, lazy=False, cache=CACHE, max_height=None):
+        # height picks that face, max_height the tallest face not above it, else the first.
+        self.file = file
+        self.lazy = lazy
+        self.size = cache
+        self.hits = 0
+        self.misses = 0
+        f = open_asset(file)
+        magic, version, faces, _ = struct.unpack(PackedFont.HEADER, f.read(struct.calcsize(PackedFont.HEADER)))
+        if magic != PackedFont.MAGIC:
+            f.close()
+            raise ValueError('not a packed font: %s' % file)
+        n = struct.calcsize(PackedFont.FACE)
+        face = None
+        heights = []
+        for i in range(faces):
+            rec = struct.unpack(PackedFont.FACE, f.read(n))
+            heights.append(rec[0])
+            if max_height is not None:
+                if rec[0] <= max_height and (face is None or rec[0] > face[0]):
+                    face = rec
+            elif face is None and (height is None or rec[0] == height):
+                face = rec
+        if face is None:
+            f.close()
+            if max_height is not None:
+                raise ValueError('no face up to %d px in %s, has %s' % (max_height, file, heights))
+            raise ValueError('no %s px face in %s, has %s' % (height, file, heights))
+        self.height, self.max_width, count, index = face
+        if count <= 0:
+            f.close()
+            raise ValueError('no glyphs in the %d px face of %s' % (self.height, file))
+        # code -> (width, offset of the bitmap)
+        self.index = {}
+        n = struct.calcsize(PackedFont.ENTRY)
+        f.seek(index)
+        start = None
+        end = 0
+        row = (self.height + 7) >> 3
+        for i in range(count):
+            code, w, _, off = struct.unpack(PackedFont.ENTRY, f.read(n))
+            self.index[code] = (w, off)
+            if start is None:
+                start = off
+            end = max(end, off + w * row)
+        self.fallback = code
+        self.glyphs = {}
+        self.keys = []
+        if lazy:
+            self.f = f
+            self.base = 0
+            self.data = None
+        else:
+            f.seek(start)
+            self.base = start
+            self.data = memoryview(f.read(end - start))
+            f.close()
+        # Index 0 is the background, 1 the foreground.
+        self.palette = framebuf.FrameBuffer(bytearray(4), 2, 1, framebuf.RGB565)
+
+    def glyph(self, c):
+        code = ord(c)
+        if code not in self.index:
+            code = self.fallback
+        g = self.glyphs.get(code)
+        if g is not None:
+            self.hits += 1
+            if self.lazy and self.keys[-1] != code:
+                self.keys.remove(code)
+                self.keys.append(code)
+            return g
+        self.misses += 1
+        w, off = self.index[code]
+        n = ((self.height + 7) >> 3) * w
+        if self.lazy:
+            if len(self.keys) >= self.size:
+                del self.glyphs[self.keys.pop(0)]
+            self.f.seek(off)
+            bits = bytearray(self.f.read(n))
+            self.keys.append(code)
+        else:
+            bits = self.data[off - self.base:off - self.base + n]
+        g = framebuf.FrameBuffer(bits, self.height, w, framebuf.MONO_HLSB), w
+        self.glyphs[code] = g
+        return g
+
+    def draw_v(self, fbuf, x, y, text, fc, bc=None):
+        # Draws down from (x, y) like TFTBuf.text8x16_v, returns the length drawn.
+        pal = self.palette
+        if bc is None:
+            key = 0 if fc else 0xFFFF
+            pal.pixel(0, 0, key)
+        else:
+            key = -1
+            pal.pixel(0, 0, bc)
+        pal.pixel(1, 0, fc)
+        yy = y
+        for c in text:
+            g, w = self.glyph(c)
+            fbuf.blit(g, x, yy, key, pal)
+            yy += w
+        return yy - y
+
+    def text_len(self, text):
+        n = 0
+        for c in text:
+            code = ord(c)
+            n += self.index[code if code in self.index else self.fallback][0]
+        return n
+
+    def close(self):
+        if self.lazy:
+            self.f.close()
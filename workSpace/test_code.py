@@ -12,9 +12,9 @@ tft.invertcolor(True)
 from font import ASCIIFont
 
 font = ASCIIFont(file='ascii.font')
-img = font.str_img('ABCD', (0, 0), (0xF8, 0))
-img = img.getvalue()
-tft.image(30, 0, 45, 32, img)
+img = bytearray(4 * ASCIIFont.CHAR_BYTES)
+n = font.str_into('ABCD', img, 0, (0, 0), (0xF8, 0))
+tft.image(30, 0, 45, 32, memoryview(img)[:n])
 
 
 x = 26
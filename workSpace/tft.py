@@ -1,92 +1,1108 @@
+import gc
+import struct
 import time
 
 import framebuf
+import micropython
+try:
+    import _thread
+except ImportError:
+    _thread = None
 from machine import SPI
 
 from ST7735 import TFT
+from assets import open_asset, asset_size
 from beeos import Process, OSKernel
 from board_driver import D_MOSI, D_MISO, D_SCLK, D_DC, D_RES, D_CS, D_BKL
-from font import ASCIIFont
+from font import ASCIIFont, PackedFont
 from log import Log
 
 log = Log(tag='tft')
 
 
+def rect_union(a, b):
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def rect_area(r):
+    return (r[2] - r[0]) * (r[3] - r[1])
+
+
+def rect_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def rect_clip(a, b):
+    return max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+
+
+class GlyphCache:
+    # 8x16 glyphs rotated for text8x16_v, pre-rendered once per (char, fg, bg) and drawn with one blit.
+    W = 16
+    H = 8
+    MAX_GLYPHS = 32
+    WARM = '0123456789:-.% '
+
+    def __init__(self, font, size=MAX_GLYPHS):
+        self.font = font
+        self.size = size
+        # Least recently used first.
+        self.keys = []
+        self.glyphs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, c, fc, bc):
+        k = (c, fc, bc)
+        g = self.glyphs.get(k)
+        if g is not None:
+            self.hits += 1
+            if self.keys[-1] != k:
+                self.keys.remove(k)
+                self.keys.append(k)
+            return g
+        self.misses += 1
+        if len(self.keys) >= self.size:
+            # Reuse the evicted glyph buffer.
+            fb = self.glyphs.pop(self.keys.pop(0))[0]
+        else:
+            fb = framebuf.FrameBuffer(bytearray(self.W * self.H * 2), self.W, self.H, framebuf.RGB565)
+        g = fb, self.render(fb, c, fc, bc)
+        self.keys.append(k)
+        self.glyphs[k] = g
+        return g
+
+    def render(self, fb, c, fc, bc):
+        # No background is drawn transparent, through a key colour that is not fc.
+        key = -1 if bc is not None else (0 if fc else 0xFFFF)
+        fb.fill(key if bc is None else bc)
+        font_m = self.font.find_font(c)
+        rows = len(font_m)
+        for ri in range(rows):
+            r = font_m[rows - ri - 1]
+            for i in range(8):
+                if r & (0x80 >> i):
+                    fb.pixel(ri, i, fc)
+        return key
+
+    def warm(self, chars, fc, bc=None):
+        for c in chars:
+            self.get(c, fc, bc)
+
+
 class TFTBuf:
-    def __init__(self, tft):
-        self.buf = bytearray(80 * 160 * 2)
-        self.fbuf = framebuf.FrameBuffer(self.buf, 80, 160, framebuf.RGB565)
+    W = 80
+    H = 160
+    # Position of the frame buffer on the panel.
+    X0 = 26
+    Y0 = 1
+    MAX_RECTS = 6
+    # Extra pixels two dirty rects may cover when merged into their bounding box.
+    MERGE_SLACK = 256
+    # Rows expanded per SPI write in the indexed formats.
+    LINES = 4
+    # Direct-mapped slots remembering nearest-colour matches once the palette is full.
+    NEAR = 32
+    # Image rows read in one go when fill_img_rect copies a narrow rect out of a file.
+    SPAN = 8
+
+    def __init__(self, tft, cache=None, fmt=framebuf.RGB565, font=None, glyphs=None):
+        s = TFTBuf
+        self.fmt = fmt
+        self.gs4 = fmt == framebuf.GS4_HMSB
+        if fmt == framebuf.RGB565:
+            size = s.W * s.H * 2
+            self.lut = None
+        elif fmt == framebuf.GS8 or self.gs4:
+            # Pixels are palette indexes, show() expands them to RGB565 through the LUT.
+            size = s.W * s.H // 2 if self.gs4 else s.W * s.H
+            self.lut = bytearray(32 if self.gs4 else 512)
+            self.lut4 = bytearray(1024) if self.gs4 else None
+            self.line = memoryview(bytearray(s.W * 2 * s.LINES))
+            self.colors = {}
+            self.near = [None] * s.NEAR
+            self.used = 0
+            self.palette = None
+        else:
+            raise ValueError('unsupported frame buffer format %s' % fmt)
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.fbuf = framebuf.FrameBuffer(self.buf, s.W, s.H, fmt)
         self.tft = tft
-        self.font = ASCIIFont('ascii.font')
+        self.cache = cache
+        self.images = {}
+        self.span = None
+        self.font = font or ASCIIFont('ascii.font')
+        self.glyphs = glyphs or GlyphCache(self.font)
+        # Dirty rects as (x0, y0, x1, y1), x1/y1 exclusive.
+        self.dirty = []
+
+    def twin(self):
+        # Second frame buffer on the same panel, sharing the caches and the font.
+        t = TFTBuf(self.tft, self.cache, self.fmt, self.font, self.glyphs)
+        t.images = self.images
+        return t
+
+    def copy_from(self, src):
+        # Takes over the dirty rects of src, leaving this buffer holding the same frame.
+        if src.lut is not None:
+            self.lut[:] = src.lut
+            if self.gs4:
+                self.lut4[:] = src.lut4
+            self.colors = dict(src.colors)
+            self.near = list(src.near)
+            self.used = src.used
+            self.palette = src.palette
+        row = len(self.buf) // TFTBuf.H
+        for x0, y0, x1, y1 in src.dirty:
+            a = x0 * row // TFTBuf.W
+            b = (x1 * row + TFTBuf.W - 1) // TFTBuf.W
+            for y in range(y0 * row, y1 * row, row):
+                self.mv[y + a:y + b] = src.mv[y + a:y + b]
+
+    def mark(self, x, y, w, h):
+        r = (max(x, 0), max(y, 0), min(x + w, TFTBuf.W), min(y + h, TFTBuf.H))
+        if r[0] >= r[2] or r[1] >= r[3]:
+            return
+        dirty = self.dirty
+        i = 0
+        while i < len(dirty):
+            d = dirty[i]
+            u = rect_union(d, r)
+            if rect_overlap(d, r) or rect_area(u) <= rect_area(d) + rect_area(r) + TFTBuf.MERGE_SLACK:
+                del dirty[i]
+                r = u
+                i = 0
+            else:
+                i += 1
+        dirty.append(r)
+        if len(dirty) > TFTBuf.MAX_RECTS:
+            u = dirty[0]
+            for d in dirty:
+                u = rect_union(u, d)
+            self.dirty = [u]
+
+    def mark_all(self):
+        self.dirty = [(0, 0, TFTBuf.W, TFTBuf.H)]
+
+    def color(self, c):
+        # RGB565 as framebuf stores it, or its palette index in an indexed frame buffer.
+        if self.lut is None or c is None:
+            return c
+        i = self.colors.get(c)
+        if i is None:
+            i = self.add_color(c)
+        return i
+
+    def add_color(self, c):
+        lut = self.lut
+        if self.used < len(lut) >> 1:
+            i = self.used
+            self.used += 1
+            lut[i * 2] = c & 0xFF
+            lut[i * 2 + 1] = c >> 8
+            if self.gs4:
+                self._build_lut4()
+            self.colors[c] = i
+            return i
+        # Palette full, take the nearest colour as the panel sees it (bytes swapped). Matches
+        # go to a small direct-mapped table, not colors, so odd shades cannot grow the heap.
+        slot = (c ^ (c >> 8)) & (TFTBuf.NEAR - 1)
+        near = self.near[slot]
+        if near is not None and near[0] == c:
+            return near[1]
+        v = ((c & 0xFF) << 8) | (c >> 8)
+        best = -1
+        for j in range(self.used):
+            p = (lut[j * 2] << 8) | lut[j * 2 + 1]
+            d = (((p >> 11) - (v >> 11)) << 1) ** 2 + (((p >> 5) & 0x3F) - ((v >> 5) & 0x3F)) ** 2 + \
+                (((p & 0x1F) - (v & 0x1F)) << 1) ** 2
+            if best < 0 or d < best:
+                best = d
+                i = j
+        self.near[slot] = (c, i)
+        return i
+
+    def set_palette(self, pal):
+        # pal holds 2 bytes per entry in frame buffer byte order, as in a .bimg.
+        n = len(pal) >> 1
+        if n > len(self.lut) >> 1:
+            raise ValueError('%d colours do not fit the frame buffer palette' % n)
+        self.lut[:len(pal)] = pal
+        self.colors = {}
+        self.near = [None] * TFTBuf.NEAR
+        for i in range(n - 1, -1, -1):
+            self.colors[pal[i * 2] | (pal[i * 2 + 1] << 8)] = i
+        self.used = n
+        self.palette = pal
+        if self.gs4:
+            self._build_lut4()
+        self.mark_all()
+
+    def _build_lut4(self):
+        # One GS4 byte to its two RGB565 pixels, high nibble first.
+        lut = self.lut
+        lut4 = self.lut4
+        for b in range(256):
+            h = (b >> 4) << 1
+            l = (b & 0x0F) << 1
+            lut4[b * 4] = lut[h]
+            lut4[b * 4 + 1] = lut[h + 1]
+            lut4[b * 4 + 2] = lut[l]
+            lut4[b * 4 + 3] = lut[l + 1]
+
+    @micropython.native
+    def _expand(self, y, x0, x1, dst, o):
+        buf = self.buf
+        if self.gs4:
+            lut = self.lut4
+            i = (y * TFTBuf.W + x0) >> 1
+            for j in range(i, i + ((x1 - x0) >> 1)):
+                p = buf[j] << 2
+                dst[o] = lut[p]
+                dst[o + 1] = lut[p + 1]
+                dst[o + 2] = lut[p + 2]
+                dst[o + 3] = lut[p + 3]
+                o += 4
+        else:
+            lut = self.lut
+            i = y * TFTBuf.W + x0
+            for j in range(i, i + x1 - x0):
+                p = buf[j] << 1
+                dst[o] = lut[p]
+                dst[o + 1] = lut[p + 1]
+                o += 2
+        return o
+
+    def _show_indexed(self):
+        s = TFTBuf
+        tft = self.tft
+        line = self.line
+        for x0, y0, x1, y1 in self.dirty:
+            if self.gs4:
+                x0 &= ~1
+                x1 = (x1 + 1) & ~1
+            tft.window_begin(s.X0 + x0, s.Y0 + y0, s.X0 + x1 - 1, s.Y0 + y1 - 1)
+            o = 0
+            for y in range(y0, y1):
+                o = self._expand(y, x0, x1, line, o)
+                if o + (x1 - x0) * 2 > len(line) or y == y1 - 1:
+                    tft.window_write(line[:o])
+                    o = 0
+            tft.window_end()
 
     def show(self):
         start = time.ticks_ms()
-        self.tft.image(26, 1, 105, 160, self.buf)
+        s = TFTBuf
+        row = s.W * 2
+        if self.lut is not None:
+            self._show_indexed()
+            self.dirty = []
+            log.debug('SHOW(FLUSH)[indexed]:%s ms' % (time.ticks_ms() - start))
+            return
+        for x0, y0, x1, y1 in self.dirty:
+            if x0 == 0 and x1 == s.W:
+                self.tft.image(s.X0, s.Y0 + y0, s.X0 + s.W - 1, s.Y0 + y1 - 1, self.mv[y0 * row:y1 * row])
+            else:
+                self.tft.image_rows(s.X0 + x0, s.Y0 + y0, s.X0 + x1 - 1, s.Y0 + y1 - 1,
+                                    self.mv, y0 * row + x0 * 2, row)
+        regions = len(self.dirty)
+        self.dirty = []
         end = time.ticks_ms()
-        log.debug('SHOW(FLUSH):%s ms' % (end - start))
+        log.debug('SHOW(FLUSH)[%d]:%s ms' % (regions, end - start))
 
     def text8x8_h(self, x, y, text, c=0):
         start = time.ticks_ms()
-        self.fbuf.text(text, x, y, c)
+        self.fbuf.text(text, x, y, self.color(c))
+        self.mark(x, y, len(text) * 8, 8)
         end = time.ticks_ms()
         log.debug('TEXT_8-8[%s]:%s ms' % (text, (end - start)))
 
     def text8x16_v(self, x, y, text, fc, bc=None):
         start = time.ticks_ms()
         yoffset = y
+        fbuf = self.fbuf
+        glyphs = self.glyphs
+        fc = self.color(fc)
+        bc = self.color(bc) if bc else None
         for cc in text:
-            font_m = self.font.find_font(cc)
-            rows = len(font_m)
-            for ri in range(rows):
-                r = font_m[rows - ri - 1]
-                for i in range(8):
-                    if r & (0x80 >> i):
-                        self.fbuf.pixel(x + ri, yoffset + i, fc)
-                    elif bc:
-                        self.fbuf.pixel(x + ri, yoffset + i, bc)
+            g, key = glyphs.get(cc, fc, bc)
+            fbuf.blit(g, x, yoffset, key)
             yoffset += 8
+        self.mark(x, y, 16, yoffset - y)
         end = time.ticks_ms()
         log.debug('TEXT_8-16[%s]:%s ms' % (text, (end - start)))
 
+    def text_v(self, font, x, y, text, fc, bc=None):
+        # Text in a PackedFont, drawn down the panel like text8x16_v.
+        start = time.ticks_ms()
+        n = font.draw_v(self.fbuf, x, y, text, self.color(fc), self.color(bc))
+        self.mark(x, y, font.height, n)
+        end = time.ticks_ms()
+        log.debug('TEXT_V[%s]:%s ms' % (text, (end - start)))
+
     def clear(self, c):
-        self.fbuf.fill(c)
+        self.fbuf.fill(self.color(c))
+        self.mark_all()
+
+    def fill_rect(self, x, y, w, h, c):
+        self.fbuf.fill_rect(x, y, w, h, self.color(c))
+        self.mark(x, y, w, h)
 
     def image(self, file, x, y, w):
         start = time.ticks_ms()
-        with open(file, 'rb') as f:
+        with open_asset(file) as f:
             yoff = 0
             while True:
                 row = f.read(w * 2)
                 for i in range(0, len(row), 2):
                     color = row[i] | (row[i + 1] << 8)
-                    self.fbuf.pixel(x + int(i / 2), y + yoff, color)
+                    self.fbuf.pixel(x + int(i / 2), y + yoff, self.color(color))
                 yoff += 1
                 if len(row) < (w * 2):
                     break
+        self.mark(x, y, w, yoff)
         end = time.ticks_ms()
         log.debug('FILL_IMG:%s ms' % (end - start))
 
+    def image_rect(self, file, x, y, w, clip):
+        # RGB565 image w wide placed at x, y, read only where it falls inside clip.
+        if self.lut is not None:
+            self.image(file, x, y, w)
+            return
+        h = asset_size(file) // (w * 2)
+        cx, cy, cx1, cy1 = rect_clip(rect_clip(clip, (x, y, x + w, y + h)), (0, 0, TFTBuf.W, TFTBuf.H))
+        if cx >= cx1 or cy >= cy1:
+            return
+        n = (cx1 - cx) * 2
+        with open_asset(file) as f:
+            for yy in range(cy, cy1):
+                f.seek(((yy - y) * w + cx - x) * 2)
+                o = (yy * TFTBuf.W + cx) * 2
+                self._readinto(f, self.mv[o:o + n])
+        self.mark(cx, cy, cx1 - cx, cy1 - cy)
+
+    @staticmethod
+    def _readinto(f, mv):
+        # readinto may return short counts, keep going until the slice is full or EOF.
+        got = 0
+        n = len(mv)
+        while got < n:
+            r = f.readinto(mv[got:])
+            if not r:
+                break
+            got += r
+        return got
+
+    def cached(self, file, w):
+        if self.cache is None or w != TFTBuf.W or self.lut is not None:
+            return None
+        data = self.cache.get(file)
+        if data is None or len(data) != len(self.buf):
+            return None
+        return data
+
+    def rle(self, file):
+        img = self.images.get(file)
+        if img is None:
+            img = RLEImage(file)
+            self.images[file] = img
+        return img
+
+    def fill_indexed(self, file, x, y, x1, y1):
+        if not RLEImage.is_rle(file):
+            raise ValueError('indexed frame buffer needs a palette .bimg, not %s' % file)
+        img = self.rle(file)
+        if img.palette != self.palette:
+            self.set_palette(img.palette)
+        img.draw_index(self.mv, TFTBuf.W, x, y, x1, y1, self.gs4)
+
     def fill_img(self, file, w):
+        # w is the row width of a raw RGB565 file, .bimg files carry their own.
         start = time.ticks_ms()
-        with open(file, 'rb') as f:
-            y = 0
-            while True:
-                row = f.read(w * 2)
-                offset = y * w * 2
-                row_len = len(row)
-                for x in range(row_len):
-                    self.buf[offset + x] = row[x]
-                y += 1
-                if row_len < (w * 2):
-                    break
+        data = self.cached(file, w)
+        if self.lut is not None:
+            self.fill_indexed(file, 0, 0, TFTBuf.W, TFTBuf.H)
+        elif data is not None:
+            self.mv[:] = data
+        elif RLEImage.is_rle(file):
+            self.rle(file).draw(self.mv, TFTBuf.W, 0, 0, TFTBuf.W, TFTBuf.H)
+        elif w == TFTBuf.W:
+            with open_asset(file) as f:
+                self._readinto(f, self.mv)
+        else:
+            self.fill_img_rect(file, w, 0, 0, min(w, TFTBuf.W), TFTBuf.H)
+        self.mark_all()
         end = time.ticks_ms()
         log.debug('FILL_IMG(FULL):%s ms' % (end - start))
 
+    def fill_img_rect(self, file, w, x, y, rw, rh):
+        start = time.ticks_ms()
+        x1 = min(x + rw, TFTBuf.W)
+        y1 = min(y + rh, TFTBuf.H)
+        x = max(x, 0)
+        y = max(y, 0)
+        if x >= x1 or y >= y1:
+            return
+        n = (x1 - x) * 2
+        mv = self.mv
+        data = self.cached(file, w)
+        if self.lut is not None:
+            self.fill_indexed(file, x, y, x1, y1)
+        elif data is not None:
+            if x == 0 and x1 == TFTBuf.W:
+                mv[y * n:y1 * n] = data[y * n:y1 * n]
+            else:
+                for yy in range(y, y1):
+                    offset = (yy * TFTBuf.W + x) * 2
+                    mv[offset:offset + n] = data[offset:offset + n]
+        elif RLEImage.is_rle(file):
+            self.rle(file).draw(mv, TFTBuf.W, x, y, x1, y1)
+        else:
+            with open_asset(file) as f:
+                if w == TFTBuf.W and x == 0 and x1 == TFTBuf.W:
+                    f.seek(y * w * 2)
+                    self._readinto(f, mv[y * n:y1 * n])
+                else:
+                    self._read_rows(f, w, x, y, x1, y1)
+        self.mark(x, y, x1 - x, y1 - y)
+        end = time.ticks_ms()
+        log.debug('FILL_IMG(%d,%d,%d,%d):%s ms' % (x, y, x1 - x, y1 - y, end - start))
+
+    def _read_rows(self, f, w, x, y, x1, y1):
+        # A rect narrower than the file, read SPAN rows at a time from (x, y) to the end of
+        # the rect in the last row, then copy each row's n bytes out: one seek and read per
+        # span instead of per row.
+        row = w * 2
+        if self.span is None or len(self.span) < row * TFTBuf.SPAN:
+            self.span = memoryview(bytearray(row * TFTBuf.SPAN))
+        span = self.span
+        n = (x1 - x) * 2
+        mv = self.mv
+        offset = (y * TFTBuf.W + x) * 2
+        while y < y1:
+            k = min(TFTBuf.SPAN, y1 - y)
+            m = (k - 1) * row + n
+            f.seek((y * w + x) * 2)
+            got = f.readinto(span[:m])
+            if got < m:
+                got += self._readinto(f, span[got:m])
+            for i in range(0, got - n + 1, row):
+                mv[offset:offset + n] = span[i:i + n]
+                offset += TFTBuf.W * 2
+            y += k
+
+
+class RLEImage:
+    # .bimg written by image_tools.py, decoded a row at a time with scratch for one row.
+    MAGIC = b'BIMG'
+    HEADER = '<4sBBHHHH'
+    RLE565 = 0
+    PAL8 = 1
+    PAL4 = 2
+
+    def __init__(self, file):
+        self.file = file
+        n = struct.calcsize(RLEImage.HEADER)
+        with open_asset(file) as f:
+            magic, kind, _, w, h, colors, longest = struct.unpack(RLEImage.HEADER, f.read(n))
+            if magic != RLEImage.MAGIC:
+                raise ValueError('not a bimg: %s' % file)
+            self.palette = f.read(colors * 2)
+            self.table = f.read((h + 1) * 4)
+        self.kind = kind
+        self.w = w
+        self.h = h
+        self.data = n + colors * 2 + (h + 1) * 4
+        self.src = memoryview(bytearray(longest))
+        self.line = memoryview(bytearray(w * 2))
+
+    @staticmethod
+    def is_rle(file):
+        return file.endswith('.bimg')
+
+    @staticmethod
+    def _fill(mv, o, n, k=2):
+        # mv[o:o + k] holds the pixel, repeat it over n bytes by doubling the copied span.
+        while k < n:
+            m = min(k, n - k)
+            mv[o + k:o + k + m] = mv[o:o + m]
+            k += m
+
+    def _row(self, src, n, dst):
+        pal = self.palette
+        kind = self.kind
+        fill = RLEImage._fill
+        i = 0
+        o = 0
+        if kind == RLEImage.PAL4:
+            while i < n:
+                c = src[i]
+                i += 1
+                p = (c & 0x0F) << 1
+                dst[o] = pal[p]
+                dst[o + 1] = pal[p + 1]
+                k = ((c >> 4) + 1) << 1
+                fill(dst, o, k)
+                o += k
+            return
+        while i < n:
+            c = src[i]
+            i += 1
+            if c & 0x80:
+                if kind == RLEImage.RLE565:
+                    dst[o] = src[i]
+                    dst[o + 1] = src[i + 1]
+                    i += 2
+                else:
+                    p = src[i] << 1
+                    dst[o] = pal[p]
+                    dst[o + 1] = pal[p + 1]
+                    i += 1
+                k = ((c & 0x7F) + 1) << 1
+                fill(dst, o, k)
+                o += k
+            elif kind == RLEImage.RLE565:
+                k = (c + 1) << 1
+                dst[o:o + k] = src[i:i + k]
+                i += k
+                o += k
+            else:
+                for j in range(c + 1):
+                    p = src[i] << 1
+                    dst[o] = pal[p]
+                    dst[o + 1] = pal[p + 1]
+                    i += 1
+                    o += 2
+
+    def _row_index(self, src, n, dst):
+        fill = RLEImage._fill
+        i = 0
+        o = 0
+        if self.kind == RLEImage.PAL4:
+            while i < n:
+                c = src[i]
+                i += 1
+                k = (c >> 4) + 1
+                dst[o] = c & 0x0F
+                fill(dst, o, k, 1)
+                o += k
+            return
+        while i < n:
+            c = src[i]
+            i += 1
+            if c & 0x80:
+                k = (c & 0x7F) + 1
+                dst[o] = src[i]
+                i += 1
+                fill(dst, o, k, 1)
+            else:
+                k = c + 1
+                dst[o:o + k] = src[i:i + k]
+                i += k
+            o += k
+
+    def draw_index(self, mv, stride, x, y, x1, y1, gs4=False):
+        # Palette indexes instead of colours, into a GS8 or GS4_HMSB buffer `stride` pixels wide.
+        if self.kind == RLEImage.RLE565:
+            raise ValueError('%s has no palette' % self.file)
+        x1 = min(x1, self.w)
+        y1 = min(y1, self.h)
+        if x >= x1 or y >= y1:
+            return
+        idx = self.line[:self.w]
+        t = self.table
+        start = struct.unpack_from('<I', t, y * 4)[0]
+        with open_asset(self.file) as f:
+            f.seek(self.data + start)
+            for row in range(y, y1):
+                end = struct.unpack_from('<I', t, (row + 1) * 4)[0]
+                n = end - start
+                TFTBuf._readinto(f, self.src[:n])
+                self._row_index(self.src, n, idx)
+                o = row * stride
+                if not gs4:
+                    mv[o + x:o + x1] = idx[x:x1]
+                else:
+                    for px in range(x, x1):
+                        i = (o + px) >> 1
+                        if px & 1:
+                            mv[i] = (mv[i] & 0xF0) | idx[px]
+                        else:
+                            mv[i] = (idx[px] << 4) | (mv[i] & 0x0F)
+                start = end
+
+    def draw(self, mv, stride, x, y, x1, y1, oy=0):
+        # Rows [y, y1) and columns [x, x1) of the image into mv, a buffer `stride` pixels wide
+        # whose first row is image row oy.
+        x1 = min(x1, self.w)
+        y1 = min(y1, self.h)
+        if x >= x1 or y >= y1:
+            return
+        whole = x == 0 and x1 == self.w
+        t = self.table
+        start = struct.unpack_from('<I', t, y * 4)[0]
+        with open_asset(self.file) as f:
+            f.seek(self.data + start)
+            for row in range(y, y1):
+                end = struct.unpack_from('<I', t, (row + 1) * 4)[0]
+                n = end - start
+                TFTBuf._readinto(f, self.src[:n])
+                o = (row - oy) * stride * 2
+                if whole:
+                    self._row(self.src, n, mv[o:o + self.w * 2])
+                else:
+                    self._row(self.src, n, self.line)
+                    mv[o + x * 2:o + x1 * 2] = self.line[x * 2:x1 * 2]
+                start = end
+
+
+class BgCache:
+    # Full frame backgrounds kept in RAM, so a redraw restores them with a slice copy.
+    BUDGET = 2 * TFTBuf.W * TFTBuf.H * 2
+    # Heap that must stay free after loading, below it entries are dropped.
+    MIN_FREE = 24 * 1024
+
+    def __init__(self, budget=BUDGET, min_free=MIN_FREE):
+        self.budget = budget
+        self.min_free = min_free
+        # Least recently used first.
+        self.keys = []
+        self.data = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Files that can never be cached: missing, bigger than the budget or a bad .bimg.
+        self.failed = set()
+        # Files that did not fit the heap -> free bytes needed before the next try.
+        self.waiting = {}
+
+    def get(self, file):
+        data = self.data.get(file)
+        if data is not None:
+            self.hits += 1
+            if self.keys[-1] != file:
+                self.keys.remove(file)
+                self.keys.append(file)
+            return data
+        self.misses += 1
+        if file in self.failed:
+            return None
+        need = self.waiting.get(file)
+        if need is not None:
+            # No stat or gc.collect() again until an eviction or the heap has recovered.
+            if gc.mem_free() <= need:
+                return None
+            del self.waiting[file]
+        return self.load(file)
+
+    def load(self, file):
+        img = None
+        if RLEImage.is_rle(file):
+            try:
+                img = RLEImage(file)
+            except (OSError, ValueError):
+                self.failed.add(file)
+                return None
+            n = img.w * img.h * 2
+        else:
+            n = asset_size(file)
+        if n is None or n > self.budget:
+            self.failed.add(file)
+            return None
+        while self.keys and self.size + n > self.budget:
+            self.evict()
+        if not self.reserve(n):
+            self.wait(file, n)
+            return None
+        try:
+            data = bytearray(n)
+        except MemoryError:
+            # Free but fragmented heap, the caller falls back to the file.
+            self.wait(file, n)
+            return None
+        if img is not None:
+            img.draw(memoryview(data), img.w, 0, 0, img.w, img.h)
+        else:
+            with open_asset(file) as f:
+                if TFTBuf._readinto(f, memoryview(data)) < n:
+                    self.failed.add(file)
+                    return None
+        self.keys.append(file)
+        self.data[file] = memoryview(data)
+        self.size += n
+        log.debug('BG_CACHE[%s] %d/%d B' % (file, self.size, self.budget))
+        return self.data[file]
+
+    def wait(self, file, n):
+        self.waiting[file] = max(gc.mem_free(), n + self.min_free)
+
+    def reserve(self, n):
+        # Memory pressure, evict until n bytes fit above min_free or nothing is left.
+        if gc.mem_free() - n >= self.min_free:
+            return True
+        gc.collect()
+        while gc.mem_free() - n < self.min_free:
+            if not self.keys:
+                return False
+            self.evict()
+            gc.collect()
+        return True
+
+    def trim(self):
+        if self.keys and gc.mem_free() < self.min_free:
+            self.reserve(0)
+
+    def evict(self):
+        file = self.keys.pop(0)
+        self.size -= len(self.data.pop(file))
+        self.evictions += 1
+        self.waiting = {}
+
+    def clear(self):
+        self.keys = []
+        self.data = {}
+        self.size = 0
+        self.failed = set()
+        self.waiting = {}
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.keys), 'size': self.size, 'failed': len(self.failed),
+                'waiting': len(self.waiting)}
+
+
+class StripRenderer:
+    # Composes the screen in full width strips of `lines` rows instead of a whole frame buffer:
+    # background slice, then every text crossing the strip, then one window write per strip.
+    LINES = 16
+
+    def __init__(self, tft, pos, lines=LINES):
+        s = TFTBuf
+        self.tft = tft
+        self.pos = pos
+        self.lines = lines
+        self.buf = bytearray(s.W * lines * 2)
+        self.mv = memoryview(self.buf)
+        self.fbuf = framebuf.FrameBuffer(self.buf, s.W, lines, framebuf.RGB565)
+        self.font = ASCIIFont('ascii.font')
+        self.glyphs = GlyphCache(self.font)
+        self.images = {}
+        self.strips = 0
+
+    def restore(self, bg, y, h):
+        s = TFTBuf
+        if RLEImage.is_rle(bg):
+            img = self.images.get(bg)
+            if img is None:
+                img = RLEImage(bg)
+                self.images[bg] = img
+            img.draw(self.mv, s.W, 0, y, s.W, y + h, y)
+            return
+        with open_asset(bg) as f:
+            f.seek(y * s.W * 2)
+            TFTBuf._readinto(f, self.mv[:h * s.W * 2])
+
+    def draw_strip(self, bg, texts, y, h):
+        self.restore(bg, y, h)
+        fbuf = self.fbuf
+        x, ty = self.pos[0]
+        if ty < y + h and ty + 8 > y:
+            fbuf.text(texts[0], x, ty - y, 0)
+        for i in range(1, len(texts)):
+            x, ty = self.pos[i]
+            for c in texts[i]:
+                if ty >= y + h:
+                    break
+                if ty + 8 > y:
+                    g, key = self.glyphs.get(c, 0xFF, None)
+                    fbuf.blit(g, x, ty - y, key)
+                ty += 8
+
+    def render(self, bg, texts, rects):
+        # Redraws and pushes every strip crossing one of rects.
+        s = TFTBuf
+        for y in range(0, s.H, self.lines):
+            h = min(self.lines, s.H - y)
+            hit = False
+            for r in rects:
+                if r[1] < y + h and y < r[3]:
+                    hit = True
+            if not hit:
+                continue
+            self.draw_strip(bg, texts, y, h)
+            self.tft.image(s.X0, s.Y0 + y, s.X0 + s.W - 1, s.Y0 + y + h - 1, self.mv[:h * s.W * 2])
+            self.strips += 1
+
+
+class FramePipe:
+    # Two TFTBufs: a worker thread pushes one to the panel while the caller composes into the
+    # other. ready is the only handoff, set by the caller while it is None and cleared by the
+    # worker once the frame is on the panel, so neither side needs a lock.
+    POLL_MS = 1
+
+    def __init__(self, buf):
+        self.bufs = (buf, buf.twin())
+        self.ready = None
+        self.running = False
+        self.handed = 0
+        self.frames = 0
+        self.drops = 0
+        # Handoff to last byte on the panel, us.
+        self.latency = 0
+        self.latency_max = 0
+
+    def start(self):
+        if _thread is None or self.running:
+            return
+        self.running = True
+        _thread.start_new_thread(self._worker, ())
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+    def wait(self):
+        while self.ready is not None:
+            time.sleep_ms(FramePipe.POLL_MS)
+
+    def _worker(self):
+        while self.running or self.ready is not None:
+            buf = self.ready
+            if buf is None:
+                time.sleep_ms(FramePipe.POLL_MS)
+                continue
+            buf.show()
+            self.latency = time.ticks_diff(time.ticks_us(), self.handed)
+            self.latency_max = max(self.latency_max, self.latency)
+            self.frames += 1
+            self.ready = None
+
+    def flush(self, buf):
+        # Hands buf to the worker and returns the buffer to compose the next frame into.
+        if not self.running:
+            buf.show()
+            self.frames += 1
+            return buf
+        if self.ready is not None:
+            # Bus still busy, the frame stays in buf and goes out with the next one.
+            self.drops += 1
+            return buf
+        other = self.bufs[1] if buf is self.bufs[0] else self.bufs[0]
+        other.copy_from(buf)
+        self.handed = time.ticks_us()
+        self.ready = buf
+        return other
+
+
+class Widget:
+    # Retained part of a Screen. rect is the layout (x0, y0, x1, y1), x1/y1 exclusive.
+    # value is what was last set, area what the last render covered.
+    def __init__(self, x, y, w, h):
+        self.rect = (x, y, x + w, y + h)
+        self.value = None
+        self.area = None
+        self.invalid = True
+
+    def set(self, value):
+        if value != self.value:
+            self.value = value
+            self.invalid = True
+
+    def extent(self):
+        # Part of the layout the current value draws on.
+        return self.rect
+
+    def damage(self):
+        # What has to come back from the background before the new value is drawn.
+        e = self.extent()
+        return e if self.area is None else rect_union(self.area, e)
+
+    def validate(self):
+        self.area = self.extent()
+        self.invalid = False
+
+    def draw(self, buf, clip):
+        # Draws the current value, at least inside clip.
+        pass
+
+
+class Label(Widget):
+    # 8x16 text down the panel when the layout is taller than wide, else 8x8 across it.
+    # With a PackedFont the text always runs down the panel, font.height pixels wide.
+    def __init__(self, x, y, w, h, fc, bc=None, text='', font=None):
+        Widget.__init__(self, x, y, w, h)
+        self.fc = fc
+        self.bc = bc
+        self.value = text
+        self.font = font
+        self.vertical = h > w or font is not None
+
+    def extent(self):
+        x, y, x1, y1 = self.rect
+        if self.font is not None:
+            return x, y, x + self.font.height, min(y + self.font.text_len(self.value), y1)
+        n = len(self.value) * 8
+        if self.vertical:
+            return x, y, x + 16, min(y + n, y1)
+        return x, y, min(x + n, x1), y + 8
+
+    def draw(self, buf, clip):
+        x, y = self.rect[0], self.rect[1]
+        if self.font is not None:
+            buf.text_v(self.font, x, y, self.value, self.fc, self.bc)
+        elif self.vertical:
+            buf.text8x16_v(x, y, self.value, self.fc, self.bc)
+        else:
+            buf.text8x8_h(x, y, self.value, self.fc)
+
+
+class Icon(Widget):
+    # Value is the name of an RGB565 image as wide as the layout, None hides it.
+    def extent(self):
+        if self.value is None:
+            return self.rect[0], self.rect[1], self.rect[0], self.rect[1]
+        return self.rect
+
+    def draw(self, buf, clip):
+        if self.value is not None:
+            buf.image_rect(self.value, self.rect[0], self.rect[1], self.rect[2] - self.rect[0], clip)
+
+
+class Bar(Widget):
+    # Value 0..scale fills the layout along its longer side, bc None leaves the rest
+    # to the background. Only the span between the old and new fill is redrawn.
+    def __init__(self, x, y, w, h, fc, bc=None, scale=100):
+        Widget.__init__(self, x, y, w, h)
+        self.fc = fc
+        self.bc = bc
+        self.scale = scale
+        self.vertical = h > w
+        self.drawn = None
+
+    def fill(self, value):
+        # Layout rect split into the filled and the empty part.
+        x, y, x1, y1 = self.rect
+        v = min(max(value or 0, 0), self.scale)
+        if self.vertical:
+            m = y + (y1 - y) * v // self.scale
+            return (x, y, x1, m), (x, m, x1, y1)
+        m = x + (x1 - x) * v // self.scale
+        return (x, y, m, y1), (m, y, x1, y1)
+
+    def extent(self):
+        return self.rect if self.bc is not None else self.fill(self.value)[0]
+
+    def damage(self):
+        if self.drawn is None:
+            return self.rect
+        a = self.fill(self.drawn)[0]
+        b = self.fill(self.value)[0]
+        # The fills share their start, they differ between their ends.
+        if self.vertical:
+            return a[0], min(a[3], b[3]), a[2], max(a[3], b[3])
+        return min(a[2], b[2]), a[1], max(a[2], b[2]), a[3]
+
+    def draw(self, buf, clip):
+        done, rest = self.fill(self.value)
+        for r, c in ((done, self.fc), (rest, self.bc)):
+            if c is None:
+                continue
+            x, y, x1, y1 = rect_clip(r, clip)
+            if x < x1 and y < y1:
+                buf.fill_rect(x, y, x1 - x, y1 - y, c)
+
+    def validate(self):
+        Widget.validate(self)
+        self.drawn = self.value
+
+
+class Sparkline(Widget):
+    # Value is a sequence of samples, spread down the layout with the value across it.
+    # lo/hi fix the range, else it follows the samples.
+    def __init__(self, x, y, w, h, fc, lo=None, hi=None):
+        Widget.__init__(self, x, y, w, h)
+        self.fc = fc
+        self.lo = lo
+        self.hi = hi
+
+    def set(self, value):
+        Widget.set(self, tuple(value))
+
+    def draw(self, buf, clip):
+        v = self.value
+        if not v or len(v) < 2:
+            return
+        x, y, x1, y1 = self.rect
+        lo = min(v) if self.lo is None else self.lo
+        hi = max(v) if self.hi is None else self.hi
+        span = max(hi - lo, 1)
+        w = x1 - x - 1
+        n = len(v) - 1
+        c = buf.color(self.fc)
+        px = py = None
+        for i in range(len(v)):
+            sx = x + int((min(max(v[i], lo), hi) - lo) * w / span)
+            sy = y + (y1 - y - 1) * i // n
+            if px is not None:
+                buf.fbuf.line(px, py, sx, sy, c)
+            px = sx
+            py = sy
+        x, y, x1, y1 = rect_clip(self.rect, clip)
+        buf.mark(x, y, x1 - x, y1 - y)
+
+
+class Screen:
+    # Widgets over a background image. render() brings back the background behind the
+    # widgets whose value changed and redraws those and whatever overlaps them.
+    def __init__(self, bg=None):
+        self.bg = bg
+        self.drawn_bg = None
+        self.widgets = []
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    def damage(self):
+        # Rects to restore from the background, all of it when the background changed.
+        if self.bg != self.drawn_bg:
+            return [(0, 0, TFTBuf.W, TFTBuf.H)]
+        return [w.damage() for w in self.widgets if w.invalid]
+
+    def validate(self):
+        # The current values are on the panel.
+        for w in self.widgets:
+            w.validate()
+        self.drawn_bg = self.bg
+
+    def render(self, buf):
+        rects = self.damage()
+        if not rects:
+            return False
+        if self.bg != self.drawn_bg:
+            buf.fill_img(self.bg, TFTBuf.W)
+        else:
+            for r in rects:
+                buf.fill_img_rect(self.bg, TFTBuf.W, r[0], r[1], r[2] - r[0], r[3] - r[1])
+        # A redrawn widget also paints over later widgets it overlaps, those follow it.
+        for w in self.widgets:
+            e = w.extent()
+            clip = None
+            for r in rects:
+                if rect_overlap(e, r):
+                    clip = r if clip is None else rect_union(clip, r)
+            if clip is not None:
+                w.draw(buf, clip)
+                rects.append(e)
+        self.validate()
+        return True
+
 
 class TFTTask(Process):
     NAME = 'tft_task'
     BC = 'tft_bc'
-    FLUSH = 'tft_flush'
     TITLE = 'tft_title'
     TEXT_1 = 'tft_text1'
     TEXT_2 = 'tft_text2'
@@ -94,60 +1110,124 @@ class TFTTask(Process):
     BC_CLOCK = 'bg_clock.data'
     BC_TH = 'bg_th.data'
     ENABLE = 'tft_enable'
+    CLOCK = 'tft_clock'
+    PERIOD = 1000
+    SUBSCRIBE = (BC, TITLE, TEXT_1, TEXT_2, TEXT_3, ENABLE, CLOCK)
+    # Origin of the title (8x8, horizontal) and the three 8x16 vertical text lines.
+    TEXT_POS = ((0, 150), (60, 6), (40, 6), (20, 6))
+    # Large clock digits from a font_tools.py font, in the column left of the text lines. Shown
+    # only with a frame buffer and when the font is deployed.
+    CLOCK_FONT = 'clock.bfnt'
+    CLOCK_POS = (0, 6, 20, 140)
+    # Rows per strip to render with a StripRenderer instead of a frame buffer, 0 keeps TFTBuf.
+    STRIP_LINES = 0
+    # Push frames from a second thread while the next one is composed, see FramePipe. The
+    # second frame buffer comes out of the BgCache budget, which then keeps one background.
+    PIPELINE = False
+    # Delay before retrying a frame the busy pipe dropped, ms.
+    RETRY = 5
 
-    def __init__(self):
+    def __init__(self, strip_lines=STRIP_LINES, pipeline=PIPELINE):
         spi = SPI(2, baudrate=20000000, polarity=0, phase=0, sck=D_SCLK, mosi=D_MOSI, miso=D_MISO)
         self.bkl_pin = D_BKL
         self.tft = TFT(spi, D_DC, D_RES, D_CS, size=(106, 160))
-        self.buf = TFTBuf(self.tft)
-        self.bc = self.BC_CLOCK
-        self.t1 = ''
-        self.t2 = ''
-        self.t3 = ''
-        self.t = 'Levent'
-        self.flush = False
+        if strip_lines:
+            self.strips = StripRenderer(self.tft, TFTTask.TEXT_POS, strip_lines)
+            self.buf = None
+        else:
+            self.strips = None
+            budget = BgCache.BUDGET - TFTBuf.W * TFTBuf.H * 2 if pipeline else BgCache.BUDGET
+            self.buf = TFTBuf(self.tft, BgCache(budget))
+        self.pipe = FramePipe(self.buf) if pipeline and self.buf is not None else None
+        self.dirty = False
         self.bkl = True
         self.last_act = 0
+        # Title and text lines, fed from the context keys they are bound to.
+        self.screen = Screen(TFTTask.BC_CLOCK)
+        x, y = TFTTask.TEXT_POS[0]
+        self.labels = [self.screen.add(Label(x, y, TFTBuf.W - x, 8, 0, text='Levent'))]
+        for x, y in TFTTask.TEXT_POS[1:]:
+            self.labels.append(self.screen.add(Label(x, y, 16, TFTBuf.H - y, 0xFF)))
+        self.bind = dict(zip((TFTTask.TITLE, TFTTask.TEXT_1, TFTTask.TEXT_2, TFTTask.TEXT_3), self.labels))
+        font = self.clock_font() if self.buf is not None else None
+        if font is not None:
+            self.bind[TFTTask.CLOCK] = self.screen.add(Label(*TFTTask.CLOCK_POS, fc=0xFF, font=font))
+        # Every key is read on the first change, only the changed ones after that.
+        self.synced = False
+        # Context slot of TICKS_MS, resolved on the first loop.
+        self.s_now = None
 
     def setup(self):
         self.tft.initr()
         self.tft.invertcolor(True)
+        (self.buf or self.strips).glyphs.warm(GlyphCache.WARM, 0xFF)
+        if self.pipe is not None:
+            self.pipe.start()
 
     def loop(self, ctx):
-        now = ctx.get_var(OSKernel.TICKS_MS, 0)
-        enable = ctx.get_var(TFTTask.ENABLE, False)
-        if enable:
-            ctx.set_var(TFTTask.ENABLE, False)
-            self.last_act = now
+        if self.s_now is None:
+            self.s_now = ctx.slot(OSKernel.TICKS_MS)
+        now = ctx.get(self.s_now, 0)
+        changed = ctx.changes(self)
+        if changed:
+            self.dirty = True
+            if TFTTask.ENABLE in changed:
+                self.last_act = now
+            self.read_value(ctx, changed if self.synced else TFTTask.SUBSCRIBE)
+            self.synced = True
         if now - self.last_act > 20 * 1000:
             self.bkl_pin.off()
             self.bkl = False
         else:
             self.bkl_pin.on()
             self.bkl = True
-        self.read_value(ctx)
-        if not self.flush or not self.bkl:
+        if not self.dirty or not self.bkl:
             return
-        self.reset_flush(ctx)
+        self.dirty = False
         start = time.ticks_ms()
-        self.buf.fill_img(self.bc, 80)
-        self.buf.text8x8_h(0, 150, self.t)
-        self.buf.text8x16_v(60, 6, self.t1, 0xFF)
-        self.buf.text8x16_v(40, 6, self.t2, 0xFF)
-        self.buf.text8x16_v(20, 6, self.t3, 0xFF)
-        self.buf.show()
+        if self.strips is not None:
+            if not self.redraw_strips():
+                return
+        else:
+            self.buf.cache.trim()
+            if not self.screen.render(self.buf) and not self.buf.dirty:
+                return
+            if self.pipe is not None:
+                self.buf = self.pipe.flush(self.buf)
+                # A dropped frame is still in buf, delay() brings the retry forward.
+                if self.buf.dirty:
+                    self.dirty = True
+            else:
+                self.buf.show()
         end = time.ticks_ms()
         log.debug('TFT_FLUSH:%s ms' % (end - start))
 
-    def read_value(self, ctx):
-        s = TFTTask
-        self.bc = ctx.get_var(s.BC, s.BC_CLOCK)
-        self.t = ctx.get_var(s.TITLE, '')
-        self.t1 = ctx.get_var(s.TEXT_1, '')
-        self.t2 = ctx.get_var(s.TEXT_2, '')
-        self.t3 = ctx.get_var(s.TEXT_3, '')
-        self.flush = ctx.get_var(s.FLUSH, False)
+    def delay(self, ctx):
+        if self.dirty and self.bkl:
+            return TFTTask.RETRY
+        return TFTTask.PERIOD
 
-    @staticmethod
-    def reset_flush(ctx):
-        ctx.set_var(TFTTask.FLUSH, False)
+    def clock_font(self):
+        if asset_size(TFTTask.CLOCK_FONT) is None:
+            return None
+        try:
+            # Face height is ascent plus descent, taller faces would spill out of the column.
+            return PackedFont(TFTTask.CLOCK_FONT, lazy=True, max_height=TFTTask.CLOCK_POS[2])
+        except (OSError, ValueError) as e:
+            log.error('Error on load font: %s' % TFTTask.CLOCK_FONT, e)
+            return None
+
+    def redraw_strips(self):
+        rects = self.screen.damage()
+        if not rects:
+            return False
+        self.strips.render(self.screen.bg, tuple(w.value for w in self.labels), rects)
+        self.screen.validate()
+        return True
+
+    def read_value(self, ctx, keys):
+        for k in keys:
+            if k == TFTTask.BC:
+                self.screen.bg = ctx.get_var(k, TFTTask.BC_CLOCK)
+            elif k in self.bind:
+                self.bind[k].set(ctx.get_var(k, ''))